@@ -18,6 +18,15 @@ import os
 from io import StringIO
 from contextlib import redirect_stdout
 import logfire
+from cache import llm_cache
+from plan_library import csv_schema, plan_library
+from artifacts import Workspace, current_workspace, default_store
+from profiling import Profiler, profiling_enabled
+from deck_builder import DeckPipeline
+from task_queue import SlideTask, TaskQueue, materialize_slide_artifacts, open_queue
+from typing import Callable
+import time
+import uuid
 
 
 load_dotenv()
@@ -34,8 +43,8 @@ class SlideFormat(BaseModel):
     title: str = Field(default="", description="The title of the slide")
     text_content: str = Field(default="", description="The text content of the slide")
     bullets: list[str] = Field(default_factory=list, description="The bullets of the slide")
-    image_path: str = Field(default="", description="The path of the image to be displayed on the slide, empty if no image is required, if image is required, use the generate_and_save_image tool to generate the image and save it to the current directory")
-    graph_path: str = Field(default="", description="The path of the graph to be displayed on the slide, empty if no graph is required, if graph is required, use the graph_generator tool to generate the graph and save it to the current directory")
+    image_path: str = Field(default="", description="The path of the image to be displayed on the slide, empty if no image is required, if image is required, use the generate_and_save_image tool to generate the image and save it to the run workspace")
+    graph_path: str = Field(default="", description="The path of the graph to be displayed on the slide, empty if no graph is required, if graph is required, use the graph_generator tool to generate the graph and save it to the run workspace")
     table_data: dict[str, list[float]] = Field(default_factory=dict, description="The table data of the slide, empty if no table is required")
 
 @dataclass
@@ -50,10 +59,29 @@ class State:
     presentation_content: list[SlideFormat] = field(default_factory=list)
     csv_path: str = field(default="")
     instruction: str = field(default="")
+    reference_plan: str = field(default="")
+    run_id: str = field(default="")
+    workspace_dir: str = field(default="")
+    artifacts: list[dict] = field(default_factory=list)
+    profile_report_path: str = field(default="")
+    partial_presentation_path: str = field(default="")
+    slides_rendered: int = field(default=0)
+    # streaming deck assembly, see deck_builder.py
+    deck_pipeline: DeckPipeline | None = field(default=None, repr=False)
+    on_deck_update: Callable[[str, int], None] | None = field(default=None, repr=False)
+    task_queue: TaskQueue | None = field(default=None, repr=False)
     
 
 
 
+# distributed slide generation (see task_queue.py and worker.py)
+SLIDE_TASK_TIMEOUT = float(os.getenv("SLIDE_TASK_TIMEOUT", "3600"))
+SLIDE_TASK_POLL_INTERVAL = float(os.getenv("SLIDE_TASK_POLL_INTERVAL", "1"))
+
+TOOL_NAMES = [tool.__name__ for tool in (get_source_url, web_scraper, python_execution_tool, generate_and_save_image,
+                                         generate_powerpoint_slides, graph_generator, get_column_list, get_column_description)]
+
+
 # Building intro Agent
 
 class PlannerAgentOutput(BaseModel):
@@ -71,6 +99,13 @@ planner_agent = Agent(
 
 @planner_agent.system_prompt
 async def get_planner_agent_system_prompt(ctx: RunContext[State]):
+    reference_plan = ""
+    if ctx.deps.reference_plan:
+        reference_plan = f"""
+    **Plan of a similar earlier request:**
+    {ctx.deps.reference_plan}\n
+    Use it as a template, keep its structure where it fits and adapt the sections and instructions to this request.
+    """
     prompt = f"""
     You are a helpful assistant who is a presentation writer and planner.
     Your goal is to plan the slides of the presentation and provide the instructions for the next agent for each slide.
@@ -87,7 +122,7 @@ async def get_planner_agent_system_prompt(ctx: RunContext[State]):
     - External Context: {ctx.deps.context}\n
     
     Optional csv file path: {ctx.deps.csv_path}\n , no csv file available if not provided by the user.
-
+    {reference_plan}
     **Instructions for the next agent:**
     - Use the get_column_list tool to get the column list from the csv file if provided.
     - Use the get_column_description tool to get the description of the column if provided.
@@ -138,8 +173,8 @@ async def get_slide_agent_system_prompt(ctx: RunContext[State]):
     - get_source_url: to get the source urls for the query for research and data gathering.
     - web_scraper: to get the content of the urls for research and data gathering.
     - python_execution_tool: to execute the python code for analysis, generating metrics, tables etc.
-    - generate_and_save_image: to generate the image and save it to the current directory if required. Use this tool only if the slide requires an image. IMPORTANT: Use this tool only once per slide and always store png images.
-    - graph_generator: to generate the graph and save it to the current directory if required. Use this tool only if the slide requires a graph.
+    - generate_and_save_image: to generate the image and save it to the run workspace if required. Use this tool only if the slide requires an image. IMPORTANT: Use this tool only once per slide and always store png images.
+    - graph_generator: to generate the graph and save it to the run workspace if required. Use this tool only if the slide requires a graph. Save every file with save_path('<name>.png'), it returns the path to use.
     
     Instructions:
     - Follow the instructions provided by the previous agent strictly.
@@ -167,7 +202,6 @@ presentation_agent = Agent(
     deps_type=State,
     output_type=PresentationAgentOutput,
     tools=[Tool(generate_powerpoint_slides, takes_ctx=False)],
-    model_settings=settings,
     instrument=True
 )
     # Format blog content sections
@@ -190,7 +224,7 @@ async def get_presentation_agent_system_prompt(ctx: RunContext[State]):
 
     prompt = f"""
     You are a presentation editor who generates the final presentation based on the instructions and all the slides of the presentation provided by the previous agent.
-    You use python pptx library to generate the powerpoint slides and save it to the current directory. You have comprehensive understanding of how powerpoint slides are generated and structured. You are an expert in creating and manupulating powerpoint slides with python code only.
+    You use python pptx library to generate the powerpoint slides and save it to the run workspace. You have comprehensive understanding of how powerpoint slides are generated and structured. You are an expert in creating and manupulating powerpoint slides with python code only.
 
     Here are the instructions, keypoints, title, slides and conclusion provided by the previous agent:
     - User Query:\n {ctx.deps.user_query}
@@ -199,7 +233,7 @@ async def get_presentation_agent_system_prompt(ctx: RunContext[State]):
     \n\n
     
     Tools available:
-    - generate_powerpoint_slides: to generate the powerpoint slides and save it to the current directory. IMPORTANT: import the necessary libraries such as stringio, redirect_stdout, in the code. Use this slide only ones.
+    - generate_powerpoint_slides: to generate the powerpoint slides and save it to the run workspace using save_path('<filename>.pptx'). Use this tool only once.
     
     Instructions:
     - Study the presentation content format
@@ -211,7 +245,7 @@ async def get_presentation_agent_system_prompt(ctx: RunContext[State]):
         - Slide Layout: Landscape, wide format is preferred for the slides
     - Important: Do not forget to include the images on the slides generated by the generate_and_save_image and graph_generator tools.
     - Note: Use font size 24 for the title, 16 for the text content and 14 for the bullet points.
-    - Use the generate_powerpoint_slides tool to generate the powerpoint slides and save it to the current directory. IMPORTANT: import the necessary libraries such as stringio, redirect_stdout, in the code.
+    - Use the generate_powerpoint_slides tool to generate the powerpoint slides and save it to the run workspace using save_path('<filename>.pptx'). Print the result instead of redirecting stdout.
     
 
    Think step by step.
@@ -231,8 +265,33 @@ class PlannerAgentNode(BaseNode[State]):
         context = ctx.state.context
         current_date = datetime.now().strftime("%Y-%m-%d")
         ctx.state.current_date = current_date
-        response = await planner_agent.run(user_query, deps=ctx.state)
-        response_data = response.output
+
+        # plans are shared between runs with the same inputs (e.g. batch jobs)
+        cache_key = llm_cache.key("planner", user_query, context, ctx.state.csv_path, current_date)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            response_data = PlannerAgentOutput.model_validate(cached)
+        else:
+            # near-duplicate requests reuse or adapt the plan of a similar earlier one
+            schema = await asyncio.to_thread(csv_schema, ctx.state.csv_path)
+            match = await asyncio.to_thread(plan_library.lookup, user_query, context, schema)
+            if match is not None and match.mode == "reuse":
+                response_data = PlannerAgentOutput.model_validate(match.plan)
+                plan_library.record(match.mode, match.planning_seconds)
+                print(f'\n\n Reusing plan of "{match.source_query}" (similarity {match.similarity:.2f}, substitutions {match.substitutions})\n\n')
+            else:
+                if match is not None:
+                    ctx.state.reference_plan = PlannerAgentOutput.model_validate(match.plan).model_dump_json(indent=2)
+                start = time.perf_counter()
+                response = await planner_agent.run(user_query, deps=ctx.state)
+                planning_seconds = time.perf_counter() - start
+                response_data = response.output
+                if match is not None:
+                    plan_library.record(match.mode, max(0.0, match.planning_seconds - planning_seconds))
+                else:
+                    # adapted plans stay out of the library, it keeps plans made from scratch as templates
+                    await asyncio.to_thread(plan_library.add, user_query, context, schema, response_data.model_dump(), planning_seconds)
+            llm_cache.set(cache_key, response_data.model_dump())
         ctx.state.sections = response_data.sections
         ctx.state.instructions = response_data.instructions
         # for debugging
@@ -247,14 +306,18 @@ class SlideAgentNode(BaseNode[State]):
     Generating slides for the presentation
     """
     async def run(self, ctx: GraphRunContext[State]) -> "PresentationAgentNode":
-        for section, instruction in zip(ctx.state.sections, ctx.state.instructions):
-            ctx.state.instruction = instruction
-            query = f"For user query: {ctx.state.user_query}, generate the slide content for the section: {section} with the instructions: {instruction}"
-            response = await slide_agent.run(query, deps=ctx.state)
-            response_data = response.output
+        pipeline = start_deck_pipeline(ctx.state)
+        if ctx.state.task_queue is not None:
+            # the slides are researched by worker.py processes
+            await collect_distributed_slides(ctx.state, ctx.state.task_queue, pipeline)
+            return PresentationAgentNode()
+
+        for index, (section, instruction) in enumerate(zip(ctx.state.sections, ctx.state.instructions)):
+            response_data = await generate_slide(ctx.state, section, instruction)
             
-            # Add the slide to the presentation
+            # Add the slide to the presentation, it is rendered while the next slide is researched
             ctx.state.presentation_slides.append(response_data.slide)
+            pipeline.submit(index, response_data.slide)
             
             # for debugging
             print(f'\n\n Slide {len(ctx.state.presentation_slides)}: {response_data.slide.title}\n\n')
@@ -269,34 +332,171 @@ class PresentationAgentNode(BaseNode[State]):
     Generating the final presentation
     """
     async def run(self, ctx: GraphRunContext[State]) -> "End":
-        user_query = ctx.state.user_query
-        response = await presentation_agent.run(user_query, deps=ctx.state)
-        response_data = response.output
-        ctx.state.complete_presentation_path = response_data.complete_presentation_path
+        # the streamed deck only needs its last slides rendered
+        pipeline = ctx.state.deck_pipeline
+        deck_path = await pipeline.finish() if pipeline is not None else None
+        if deck_path:
+            ctx.state.complete_presentation_path = deck_path
+        else:
+            # rendering failed, let the editor agent build the deck
+            user_query = ctx.state.user_query
+            response = await presentation_agent.run(user_query, deps=ctx.state)
+            response_data = response.output
+            ctx.state.complete_presentation_path = response_data.complete_presentation_path
+
+            # fall back to the last deck saved in the workspace if the reported path is not a file
+            workspace = current_workspace.get()
+            if workspace is not None and not os.path.isfile(ctx.state.complete_presentation_path):
+                decks = [a["path"] for a in workspace.artifacts() if a["path"].endswith(".pptx")]
+                if decks:
+                    ctx.state.complete_presentation_path = decks[-1]
 
         # for debugging
         print(f'\n\n Complete Presentation Path: {ctx.state.complete_presentation_path}\n\n')
         return End(ctx.state)
 
 
-def run_full_agent(user_query: str, user_id: str = "123", context: str = "", csv_path: str = ""):
+async def generate_slide(state: State, section: str, instruction: str) -> SlideAgentOutput:
+    """Run the slide agent for one section, used by SlideAgentNode and worker.py"""
+    state.instruction = instruction
+    query = f"For user query: {state.user_query}, generate the slide content for the section: {section} with the instructions: {instruction}"
+    response = await slide_agent.run(query, deps=state)
+    return response.output
+
+
+async def collect_distributed_slides(state: State, queue: TaskQueue, pipeline: DeckPipeline) -> None:
+    """
+    Put one task per section on the queue and render the slides as the workers return them.
+
+    Images and graphs come back embedded in the results and are written to the local workspace.
+    """
+    # unique per attempt, so a rerun of the same batch job never picks up stale results
+    queue_run_id = f"{state.run_id}_{uuid.uuid4().hex[:8]}"
+    tasks = [
+        SlideTask(run_id=queue_run_id, index=index, section=section, instruction=instruction,
+                  user_query=state.user_query, context=state.context, csv_path=state.csv_path,
+                  current_date=state.current_date)
+        for index, (section, instruction) in enumerate(zip(state.sections, state.instructions))
+    ]
+    workspace = current_workspace.get()
+    slides: dict[int, SlideFormat] = {}
+    fetched: set[str] = set()
+    deadline = time.monotonic() + SLIDE_TASK_TIMEOUT
+    await asyncio.to_thread(queue.put_tasks, tasks)
+    try:
+        while len(slides) < len(tasks):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{len(tasks) - len(slides)} slide tasks not done after {SLIDE_TASK_TIMEOUT:.0f}s, are workers running?")
+            await asyncio.sleep(SLIDE_TASK_POLL_INTERVAL)
+            for result in await asyncio.to_thread(queue.results, queue_run_id, frozenset(fetched)):
+                fetched.add(result.task_id)
+                if result.index in slides:
+                    continue
+                if result.error:
+                    raise RuntimeError(f"Slide {result.index + 1} failed on worker {result.worker_id}: {result.error}")
+                slide = SlideFormat.model_validate(result.slide)
+                materialize_slide_artifacts(slide, result.artifacts, workspace)
+                slides[result.index] = slide
+                pipeline.submit(result.index, slide)
+
+                # for debugging
+                print(f'\n\n Slide {result.index + 1} ({result.worker_id}): {slide.title}\n\n')
+                print(f'\n\n Summary: {result.summary}\n\n')
+    finally:
+        await asyncio.to_thread(queue.delete_run, queue_run_id)
+    state.presentation_slides = [slides[index] for index in range(len(tasks))]
+
+
+def start_deck_pipeline(state: State) -> DeckPipeline:
+    """Create the incremental deck of the run, partial decks are reported through state.on_deck_update"""
+    workspace = current_workspace.get()
+    if workspace is not None:
+        path = workspace.path_for("presentation.pptx", "presentation")
+    else:
+        path = f"presentation_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pptx"
+
+    def on_update(partial_path: str, slides_rendered: int):
+        state.partial_presentation_path = partial_path
+        state.slides_rendered = slides_rendered
+        if state.on_deck_update is not None:
+            state.on_deck_update(partial_path, slides_rendered)
+
+    state.deck_pipeline = DeckPipeline(path, workspace, on_update)
+    return state.deck_pipeline
+
+
+def _start_run(state: State, workspace: Workspace | None) -> tuple[Workspace, bool]:
+    """Attach a workspace to the run state, creating one in the default store if none is given"""
+    if state.task_queue is None and os.getenv("SLIDES_TASK_QUEUE"):
+        state.task_queue = open_queue(os.environ["SLIDES_TASK_QUEUE"])
+    owned = workspace is None
+    if owned:
+        workspace = default_store().create_workspace()
+    state.run_id = workspace.run_id
+    state.workspace_dir = str(workspace.path)
+    return workspace, owned
+
+
+def _finish_run(state: State, workspace: Workspace, owned: bool) -> None:
+    if state.deck_pipeline is not None:
+        # no-op after a completed run, stops the rendering task of a failed one
+        state.deck_pipeline.cancel()
+    state.artifacts = workspace.artifacts()
+    if owned:
+        workspace.close()
+
+
+def run_full_agent(user_query: str, user_id: str = "123", context: str = "", csv_path: str = "",
+                   workspace: Workspace | None = None, on_deck_update: Callable[[str, int], None] | None = None,
+                   task_queue: TaskQueue | str | None = None):
     """Synchronous version to run the full presentation generation agent"""
     current_date = datetime.now().strftime("%Y-%m-%d")
-    state = State(user_query=user_query, current_date=current_date, context=context, csv_path=csv_path)
-    graph = Graph(nodes=[PlannerAgentNode, SlideAgentNode, PresentationAgentNode])
-    result = graph.run_sync(PlannerAgentNode(), state=state)
-    result = result.output
+    state = State(user_query=user_query, current_date=current_date, context=context, csv_path=csv_path,
+                  on_deck_update=on_deck_update,
+                  task_queue=open_queue(task_queue) if isinstance(task_queue, str) else task_queue)
+    workspace, owned = _start_run(state, workspace)
+    token = current_workspace.set(workspace)
+    try:
+        graph = Graph(nodes=[PlannerAgentNode, SlideAgentNode, PresentationAgentNode])
+        result = graph.run_sync(PlannerAgentNode(), state=state)
+        result = result.output
+    finally:
+        current_workspace.reset(token)
+        _finish_run(state, workspace, owned)
     
     return result
 
-async def run_full_agent_async(user_query: str, user_id: str = "123", context: str = "", csv_path: str = ""):
-    """Async version of run_full_agent that properly handles async operations"""
+async def run_full_agent_async(user_query: str, user_id: str = "123", context: str = "", csv_path: str = "",
+                               workspace: Workspace | None = None, profile: bool | None = None,
+                               on_deck_update: Callable[[str, int], None] | None = None,
+                               task_queue: TaskQueue | str | None = None):
+    """Async version of run_full_agent that properly handles async operations
+
+    profile=True (or SLIDES_PROFILE=1) writes a profile report and flame graph to the run workspace.
+    on_deck_update(partial_deck_path, slides_rendered) is called after every rendered slide.
+    task_queue (a queue or url, default SLIDES_TASK_QUEUE) hands the slides to worker.py processes.
+    """
     
     current_date = datetime.now().strftime("%Y-%m-%d")
-    state = State(user_query=user_query, current_date=current_date, context=context, csv_path=csv_path)
-    graph = Graph(nodes=[PlannerAgentNode, SlideAgentNode, PresentationAgentNode])
-    result = await graph.run(PlannerAgentNode(), state=state)
-    result = result.output
+    state = State(user_query=user_query, current_date=current_date, context=context, csv_path=csv_path,
+                  on_deck_update=on_deck_update,
+                  task_queue=open_queue(task_queue) if isinstance(task_queue, str) else task_queue)
+    workspace, owned = _start_run(state, workspace)
+    token = current_workspace.set(workspace)
+    profiler = Profiler(TOOL_NAMES) if profiling_enabled(profile) else None
+    if profiler is not None:
+        profiler.start()
+    try:
+        graph = Graph(nodes=[PlannerAgentNode, SlideAgentNode, PresentationAgentNode])
+        result = await graph.run(PlannerAgentNode(), state=state)
+        result = result.output
+    finally:
+        current_workspace.reset(token)
+        if profiler is not None:
+            report = await profiler.stop()
+            state.profile_report_path = profiler.write(workspace.path / "profile", report)
+            print(f'\n\n Profile Report: {state.profile_report_path}\n\n')
+        _finish_run(state, workspace, owned)
     
     return result
 
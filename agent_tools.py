@@ -16,75 +16,147 @@ from dataclasses import dataclass, field
 from langchain_community.document_loaders import WebBaseLoader
 import re
 from io import StringIO
-from contextlib import redirect_stdout
+from contextlib import contextmanager
+import sys
+import threading
 from pydantic_graph import Graph, BaseNode, GraphRunContext, End
 import os
+import pandas as pd
+from cache import search_cache, scrape_cache, image_cache
+from artifacts import artifact_path, current_workspace
+from text_normalize import normalize_text
+from profiling import track_run_thread
 
 
 load_dotenv()
 
-client = genai.Client(api_key=os.getenv("GOOGLE_GENAI_KEY"))
+# the base urls are only set to point the clients at other endpoints (e.g. the fakes of loadtest.py)
+client = genai.Client(
+    api_key=os.getenv("GOOGLE_GENAI_KEY"),
+    http_options=types.HttpOptions(base_url=os.getenv("GOOGLE_GENAI_BASE_URL")) if os.getenv("GOOGLE_GENAI_BASE_URL") else None
+)
+
+
+# namespace for the exec based tools: one per run workspace so concurrent runs don't share variables,
+# falling back to the module globals when no run is active
+def _exec_namespace() -> dict:
+    workspace = current_workspace.get()
+    if workspace is None:
+        return globals()
+    namespace = workspace.namespace
+    for name, value in globals().items():
+        namespace.setdefault(name, value)
+    return namespace
+
+
+# stdout of the exec based tools: they run in worker threads of concurrent runs, so instead of
+# swapping the process wide sys.stdout per call, one proxy routes the writes of a capturing
+# thread to that thread's buffer and everything else to the real stdout
+class _ThreadLocalStdout:
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def _target(self):
+        buffer = getattr(self.local, "buffer", None)
+        return buffer if buffer is not None else self.stream
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        return self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+_stdout_lock = threading.Lock()
+
+
+@contextmanager
+def capture_stdout():
+    """Capture what the current thread prints, other threads keep writing to stdout"""
+    with _stdout_lock:
+        # (re)installed on every call in case exec'd code replaced sys.stdout
+        if not isinstance(sys.stdout, _ThreadLocalStdout):
+            sys.stdout = _ThreadLocalStdout(sys.stdout)
+        proxy = sys.stdout
+    catcher = StringIO()
+    previous = getattr(proxy.local, "buffer", None)
+    proxy.local.buffer = catcher
+    try:
+        yield catcher
+    finally:
+        proxy.local.buffer = previous
 
 
 # Tools
 
 # to get the source urls for the final blog
+@track_run_thread
 def get_source_url(query: Annotated[str, "The query to search for"]) -> str:
     """Use this tool to get source urls for the query. Later you can use the web_scraper tool to get the content of the urls."""
 
-    client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+    cache_key = search_cache.key(query)
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    if os.getenv("TAVILY_API_BASE_URL"):
+        client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"), api_base_url=os.getenv("TAVILY_API_BASE_URL"))
+    else:
+        client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
     results = client.search(query=query, max_results=4, search_depth="advanced")
     scores = [result['score'] for result in results['results']]
     urls = [result['url'] for result in results['results']]
     images = results['images'][:len(urls)]
     
-    return f"Urls:\n{str(urls)}"
+    output = f"Urls:\n{str(urls)}"
+    search_cache.set(cache_key, output)
+    return output
 
 # to get the content of the urls
+@track_run_thread
 def web_scraper(urls: Annotated[list, "The urls to scrape for more information and data for writing the blog."],
                 length: Annotated[int, "The length of the content to scrape"] = 3000) -> str:
     """Pass one url as a string to get more information and data for writing the blog."""
     
     words_per_url = length // len(urls)  # Distribute words evenly across URLs
-    text_data = ""
+    text_parts = []
     
     for url in urls:
+        cache_key = scrape_cache.key(url, words_per_url)
+        cached = scrape_cache.get(cache_key)
+        if cached is not None:
+            text_parts.append(cached)
+            continue
+
+        page_parts = []
         try:
             loader = WebBaseLoader(url)
             data = loader.load()
             
             for doc in data:
-                # Remove HTML/XML tags first
-                content = re.sub(r'<[^>]+>', '', doc.page_content)
-                
-                # Split into paragraphs
-                paragraphs = content.split('\n')
-                clean_paragraphs = []
-                
-                for p in paragraphs:
-                    # Remove special characters and normalize spaces
-                    cleaned = re.sub(r'[^\w\s]', '', p)  # Keep only alphanumeric and spaces
-                    cleaned = re.sub(r'\s+', ' ', cleaned).strip()  # Normalize to single spaces
-                    cleaned = re.sub(r'[^a-zA-Z0-9\s]', '', cleaned)  # Remove non-English characters
-                    
-                    # Only keep paragraphs relevant to the query
-                    if len(cleaned.split()) > 10 and cleaned:
-                        clean_paragraphs.append(cleaned)
-                
-                filtered_content = ' '.join(clean_paragraphs)  # Join all paragraphs into single text
-                final_content = ' '.join(filtered_content.split()[:words_per_url])  # Take exact number of words needed
-                    
+                # Single pass: strip tags and non-English characters, keep paragraphs with more than 10 words
+                final_content = normalize_text(doc.page_content, words_per_url)
                 title = doc.metadata.get("title", "")
-                text_data += f'{title}\n{final_content}\n\n'
+                page_parts.append(f'{title}\n{final_content}\n\n')
         except:
             return f"Error scraping {url}."
+
+        page_text = ''.join(page_parts)
+        scrape_cache.set(cache_key, page_text)
+        text_parts.append(page_text)
     
+    text_data = ''.join(text_parts)
     return f"Data from the urls:\n{str(urls)}\n\n{text_data}"
 
 
 
 # to generate the images for the blog
 
+@track_run_thread
 def generate_and_save_image(prompt: Annotated[str, "The prompt to generate the image"], 
                             filename: Annotated[str, "The filename to save the image"],
                             aspect_ratio: Annotated[str, "The aspect ratio of the image"] = '1:1', 
@@ -100,6 +172,17 @@ def generate_and_save_image(prompt: Annotated[str, "The prompt to generate the i
     
     """
     import io
+
+    # the image goes into the run workspace under a collision-free name
+    filename = str(artifact_path(filename, "image"))
+
+    cache_key = image_cache.key(prompt, aspect_ratio, image_size)
+    cached = image_cache.get(cache_key)
+    if cached is not None:
+        with open(filename, 'wb') as f:
+            f.write(cached)
+        img = Image.open(io.BytesIO(cached))
+        return f"The image is saved with filename: {filename} ({len(cached):,} bytes, {img.size[0]}x{img.size[1]}, aspect ratio: {aspect_ratio})"
     
     # Build config if size/aspect ratio specified
     config = None
@@ -132,6 +215,7 @@ def generate_and_save_image(prompt: Annotated[str, "The prompt to generate the i
     for part in response.candidates[0].content.parts:
         if hasattr(part, 'inline_data') and part.inline_data:
             image_data = part.inline_data.data
+            image_cache.set(cache_key, image_data)
             
             # Save as PNG
             with open(filename, 'wb') as f:
@@ -145,12 +229,44 @@ def generate_and_save_image(prompt: Annotated[str, "The prompt to generate the i
     raise ValueError("No image data found in response")
 
 
+GRAPH_EXTENSIONS = (".png", ".jpg", ".jpeg", ".svg", ".html", ".pdf")
+
+
+def _working_dir_files(extensions: tuple[str, ...]) -> dict[str, tuple[int, int]]:
+    """(mtime, size) of the files in the working directory with these extensions"""
+    versions = {}
+    with os.scandir(".") as entries:
+        for entry in entries:
+            if entry.name.lower().endswith(extensions) and entry.is_file():
+                stat = entry.stat()
+                versions[entry.name] = (stat.st_mtime_ns, stat.st_size)
+    return versions
+
+
+def _adopt_written_files(before: dict[str, tuple[int, int]], extensions: tuple[str, ...], kind: str) -> dict[str, str]:
+    """Move the files created or changed in the working directory since `before` into the run workspace"""
+    workspace = current_workspace.get()
+    if workspace is None:
+        return {}
+    moved = {}
+    for name, version in _working_dir_files(extensions).items():
+        if before.get(name) != version:
+            try:
+                moved[name] = str(workspace.adopt(name, kind))
+            except OSError:
+                # moved by another run in the meantime
+                continue
+    return moved
+
+
 # Generating the graph
+@track_run_thread
 def graph_generator(
     code: Annotated[str, "The python code to execute to generate visualizations"]
 ) -> str:
     """
     Use this tool to generate graphs and visualizations using python code.
+    Save the files with save_path('<name>.png'), it returns a unique path in the run workspace.
 
     Print the graph path in html and png format in the following format:
     'The graph path in html format is <graph_path_html> and the graph path in png format is <graph_path_png>'.
@@ -158,18 +274,22 @@ def graph_generator(
     """
 
     
-    catcher = StringIO()
-
     try:
-        with redirect_stdout(catcher):
+        before = _working_dir_files(GRAPH_EXTENSIONS)
+        with capture_stdout() as catcher:
             # The compile step can catch syntax errors early
             compiled_code = compile(code, '<string>', 'exec')
-            exec(compiled_code, globals(), globals())
-
-            return (
-                f"The graph path is \n\n{catcher.getvalue()}\n"
-                f"Proceed to the next step"
-            )
+            namespace = _exec_namespace()
+            exec(compiled_code, namespace, namespace)
+
+        # graphs saved to the working directory instead of save_path() go to the run workspace too
+        moved = _adopt_written_files(before, GRAPH_EXTENSIONS, "graph")
+        moved_note = "".join(f"{name} was moved to {path}\n" for name, path in moved.items())
+        return (
+            f"The graph path is \n\n{catcher.getvalue()}\n"
+            f"{moved_note}"
+            f"Proceed to the next step"
+        )
 
     except Exception as e:
         return f"Failed to run code. Error: {repr(e)}, try a different approach"
@@ -177,6 +297,7 @@ def graph_generator(
     
 
 # Executing the python code
+@track_run_thread
 def python_execution_tool(
     code: Annotated[str, "The python code to execute for calculations and data processing"]
 ) -> str:
@@ -188,13 +309,12 @@ def python_execution_tool(
 
     """
     
-    catcher = StringIO()
-
     try:
-        with redirect_stdout(catcher):
+        with capture_stdout() as catcher:
             # The compile step can catch syntax errors early
             compiled_code = compile(code, '<string>', 'exec')
-            exec(compiled_code, globals(), globals())
+            namespace = _exec_namespace()
+            exec(compiled_code, namespace, namespace)
 
             return (
                 f"The calculated value is \n\n{catcher.getvalue()}\n"
@@ -206,7 +326,16 @@ def python_execution_tool(
     
     
 
+def _file_version(path: str) -> tuple[int, int] | None:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
 # Executing the python code for generating powerpoint slides
+@track_run_thread
 def generate_powerpoint_slides(
     code: Annotated[str, "The python code to execute for generating powerpoint slides using py-pptx library"],
     filename: Annotated[str, "The filename to save the powerpoint slides in format <filename>.pptx"]
@@ -217,26 +346,40 @@ def generate_powerpoint_slides(
     Always use print statement to print the result in format:
     'The powerpoint slides are generated and saved as <filename>.pptx'. Make sure to include the filename in the print statement.
     
-    Remember to import the necessary libraries such as stringio, redirect_stdout, etc.
+    Import the libraries the code needs (e.g. pptx). Print the result, don't redirect stdout.
+    Save the presentation to save_path('<filename>.pptx'), it returns a unique path in the run workspace.
 
     """
     
-    catcher = StringIO()
-
     try:
-        with redirect_stdout(catcher):
+        before = _file_version(filename)
+        with capture_stdout() as catcher:
             # The compile step can catch syntax errors early
             compiled_code = compile(code, '<string>', 'exec')
-            exec(compiled_code, globals(), globals())
-
-            return (
-                f"The powerpoint slides are generated and saved as {filename}\n"
-            )
+            namespace = _exec_namespace()
+            exec(compiled_code, namespace, namespace)
+
+        # a deck this call saved to the working directory is moved into the run workspace,
+        # a file of the same name left there by another run is not touched
+        workspace = current_workspace.get()
+        if workspace is not None:
+            after = _file_version(filename)
+            if after is not None and after != before and not workspace.contains(filename):
+                filename = str(workspace.adopt(filename, "presentation"))
+            elif not (os.path.isfile(filename) and workspace.contains(filename)):
+                saved = [a["path"] for a in workspace.artifacts() if a["path"].endswith(".pptx")]
+                if saved:
+                    filename = saved[-1]
+
+        return (
+            f"The powerpoint slides are generated and saved as {filename}\n"
+        )
 
     except Exception as e:
         return f"Failed to run code. Error: {repr(e)}, try a different approach"
     
     
+@track_run_thread
 def get_column_list(
     file_name: Annotated[str, "The name of the csv file that has the data"]
 ):
@@ -246,11 +389,13 @@ def get_column_list(
     Parameters:
     - file_name: The name of the CSV file that has the data
     """
-    df = pd.read_csv(file_name)
+    # only the header is needed, don't parse the whole file
+    df = pd.read_csv(file_name, nrows=0)
     columns = df.columns.tolist()
     return str(columns)
 
 # Getting the description of the column
+@track_run_thread
 def get_column_description(
     column_dict: Annotated[dict, "The dictionary of the column name and the description of the column"]
 ):
@@ -1,10 +1,14 @@
 import streamlit as st
 import asyncio
 from datetime import datetime
+import json
 import os
 from pathlib import Path
 import time
 from agent import run_full_agent_async, State
+from artifacts import default_store
+from deck_server import DeckServer, PPTX_MIME
+from uploads import save_upload, read_preview, PREVIEW_ROWS
 from io import StringIO
 import sys
 
@@ -71,6 +75,44 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+def load_deck_payload(path: str) -> bytes:
+    """
+    Deck bytes, read once per deck version and kept in this session only: sessions don't
+    evict each other's decks, and the bytes are freed with the session or on "Generate New".
+    """
+    deck_stat = os.stat(path)
+    version = (path, deck_stat.st_mtime_ns, deck_stat.st_size)
+    payload = st.session_state.presentation_payload
+    if payload is None or payload[0] != version:
+        with open(path, "rb") as f:
+            payload = (version, f.read())
+        st.session_state.presentation_payload = payload
+    return payload[1]
+
+
+@st.cache_resource(show_spinner=False)
+def get_deck_server() -> DeckServer | None:
+    """Local file endpoint streaming decks from disk, enabled by setting DECK_SERVER_PORT"""
+    port = os.getenv("DECK_SERVER_PORT")
+    if not port:
+        return None
+    return DeckServer(
+        host=os.getenv("DECK_SERVER_HOST", "127.0.0.1"),
+        port=int(port),
+        public_url=os.getenv("DECK_SERVER_URL"),
+    ).start()
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def load_csv_preview(file_hash: str, _path: str, rows: int = PREVIEW_ROWS):
+    """First rows of an uploaded CSV, cached per file hash"""
+    return read_preview(_path, rows)
+
+
+# Streamlit >= 1.43 can offer a download without rerunning the script, which would stop a running generation
+DOWNLOAD_WITHOUT_RERUN = tuple(int(part) for part in st.__version__.split(".")[:2]) >= (1, 43)
+
+
 # Initialize session state
 if 'generated' not in st.session_state:
     st.session_state.generated = False
@@ -78,6 +120,21 @@ if 'presentation_path' not in st.session_state:
     st.session_state.presentation_path = None
 if 'slides_count' not in st.session_state:
     st.session_state.slides_count = 0
+if 'presentation_download_name' not in st.session_state:
+    st.session_state.presentation_download_name = None
+if 'presentation_url' not in st.session_state:
+    st.session_state.presentation_url = None
+if 'presentation_payload' not in st.session_state:
+    st.session_state.presentation_payload = None
+if 'profile_report_path' not in st.session_state:
+    st.session_state.profile_report_path = None
+if 'upload_workspace' not in st.session_state:
+    # uploads of this session live in their own workspace of the artifact store,
+    # released right away so it is collected once the session stops refreshing it
+    st.session_state.upload_workspace = default_store().create_workspace()
+    st.session_state.upload_workspace.close()
+if 'uploaded_csv' not in st.session_state:
+    st.session_state.uploaded_csv = None
 
 # Header
 st.title("📊 AI Presentation Generator")
@@ -99,6 +156,11 @@ with st.sidebar:
     with st.expander("🔧 Advanced Options"):
         show_debug = st.checkbox("Show debug information", value=False)
         auto_download = st.checkbox("Auto-download when complete", value=True)
+        profile_run = st.checkbox(
+            "Profile generation",
+            value=False,
+            help="Record event-loop lag, blocking tool calls and a flame graph for the run"
+        )
     
     st.markdown("---")
     st.markdown("### 📖 How to Use")
@@ -152,17 +214,23 @@ with col2:
     
     csv_path = ""
     if uploaded_file is not None:
-        # Save uploaded file temporarily
-        csv_path = f"temp_{uploaded_file.name}"
-        with open(csv_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+        # Stream the upload to a unique path once per upload
+        if (st.session_state.uploaded_csv is None
+                or st.session_state.uploaded_csv[0] != uploaded_file.file_id
+                or not os.path.isfile(st.session_state.uploaded_csv[1])):
+            upload_path, upload_hash = save_upload(
+                uploaded_file,
+                st.session_state.upload_workspace,
+                uploaded_file.name
+            )
+            st.session_state.uploaded_csv = (uploaded_file.file_id, upload_path, upload_hash)
+        _, csv_path, csv_hash = st.session_state.uploaded_csv
+        st.session_state.upload_workspace.heartbeat()
         st.success(f"✅ Uploaded: {uploaded_file.name}")
         
         # Show preview
         if st.checkbox("Show data preview"):
-            import pandas as pd
-            df = pd.read_csv(csv_path)
-            st.dataframe(df.head(), use_container_width=True)
+            st.dataframe(load_csv_preview(csv_hash, csv_path), use_container_width=True)
 
 st.markdown("---")
 
@@ -185,10 +253,12 @@ if generate_button:
         with status_container:
             # Main status display
             with st.status("🎨 Generating your presentation...", expanded=True) as status:
+                partial_deck = {"url": None}
                 try:
                     # Progress tracking
                     progress_bar = st.progress(0)
                     status_text = st.empty()
+                    partial_download = st.empty()
                     
                     # Step 1: Planning
                     status_text.markdown("**Step 1/3:** 🧠 Planning presentation structure...")
@@ -198,6 +268,27 @@ if generate_button:
                     # Capture output for debugging
                     output_buffer = StringIO()
                     
+                    # Offer the partial deck after every rendered slide
+                    def show_partial_deck(partial_path, slides_rendered):
+                        status_text.markdown(f"**Step 2/3:** ✍️ {slides_rendered} slide(s) ready, generating the rest...")
+                        deck_server = get_deck_server()
+                        label = f"📥 Download partial deck ({slides_rendered} slides)"
+                        if deck_server is not None:
+                            # the url always serves the latest partial deck
+                            if partial_deck["url"] is None:
+                                partial_deck["url"] = deck_server.register(partial_path, "presentation_partial.pptx")
+                            partial_download.link_button(label, partial_deck["url"])
+                        elif DOWNLOAD_WITHOUT_RERUN:
+                            with open(partial_path, "rb") as f:
+                                partial_download.download_button(
+                                    label,
+                                    data=f.read(),
+                                    file_name=f"presentation_partial_{slides_rendered}.pptx",
+                                    mime=PPTX_MIME,
+                                    key=f"partial_deck_{slides_rendered}",
+                                    on_click="ignore"
+                                )
+                    
                     # Run the async function
                     async def generate_with_progress():
                         # Start generation
@@ -209,7 +300,9 @@ if generate_button:
                             user_query=user_query,
                             user_id=user_id,
                             context=context,
-                            csv_path=csv_path
+                            csv_path=csv_path,
+                            profile=profile_run or None,
+                            on_deck_update=show_partial_deck
                         )
                         
                         return result
@@ -221,16 +314,24 @@ if generate_button:
                     # Run the agent (this will take time)
                     result = asyncio.run(generate_with_progress())
                     
-                    progress_bar.progress(70)
-                    status_text.markdown("**Step 3/3:** 🎨 Creating PowerPoint presentation...")
-                    time.sleep(1)
-                    
+                    # the deck was rendered slide by slide, it is complete as soon as the agent returns
+                    partial_download.empty()
                     progress_bar.progress(100)
                     status_text.markdown("**✅ Complete!** Presentation generated successfully!")
                     
                     # Store results
                     st.session_state.presentation_path = result.complete_presentation_path
                     st.session_state.slides_count = len(result.presentation_slides)
+                    st.session_state.presentation_download_name = f"presentation_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pptx"
+                    deck_server = get_deck_server()
+                    if deck_server is not None and os.path.isfile(result.complete_presentation_path):
+                        st.session_state.presentation_url = deck_server.register(
+                            result.complete_presentation_path,
+                            st.session_state.presentation_download_name
+                        )
+                    else:
+                        st.session_state.presentation_url = None
+                    st.session_state.profile_report_path = result.profile_report_path or None
                     st.session_state.generated = True
                     
                     status.update(label="✅ Presentation generated successfully!", state="complete")
@@ -242,14 +343,11 @@ if generate_button:
                     if show_debug:
                         st.exception(e)
                     st.session_state.generated = False
-                
+
                 finally:
-                    # Clean up temporary CSV file
-                    if csv_path and os.path.exists(csv_path):
-                        try:
-                            os.remove(csv_path)
-                        except:
-                            pass
+                    # the partial deck link is replaced by the final deck (or useless after a failure)
+                    if partial_deck["url"] is not None:
+                        get_deck_server().unregister(partial_deck["url"])
 
 # Display results
 if st.session_state.generated and st.session_state.presentation_path:
@@ -285,20 +383,35 @@ if st.session_state.generated and st.session_state.presentation_path:
     
     with download_col2:
         if os.path.exists(st.session_state.presentation_path):
-            with open(st.session_state.presentation_path, "rb") as file:
-                file_data = file.read()
+            if st.session_state.presentation_url:
+                # streamed from disk by the local deck endpoint
+                st.link_button(
+                    "📥 Download Presentation",
+                    st.session_state.presentation_url,
+                    use_container_width=True
+                )
+            else:
+                # the payload is kept per deck in the session, reruns don't read the file again
+                file_data = load_deck_payload(st.session_state.presentation_path)
                 
                 st.download_button(
                     label="📥 Download Presentation",
                     data=file_data,
-                    file_name=f"presentation_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pptx",
-                    mime="application/vnd.openxmlformats-officedocument.presentationml.presentation",
+                    file_name=st.session_state.presentation_download_name,
+                    mime=PPTX_MIME,
                     use_container_width=True
                 )
         
         if st.button("🔄 Generate New Presentation", use_container_width=True):
+            deck_server = get_deck_server()
+            if deck_server is not None and st.session_state.presentation_url:
+                deck_server.unregister(st.session_state.presentation_url)
             st.session_state.generated = False
             st.session_state.presentation_path = None
+            st.session_state.presentation_download_name = None
+            st.session_state.presentation_url = None
+            st.session_state.presentation_payload = None
+            st.session_state.profile_report_path = None
             st.session_state.slides_count = 0
             st.rerun()
     
@@ -309,6 +422,20 @@ if st.session_state.generated and st.session_state.presentation_path:
     if show_debug:
         st.info(f"**File saved at:** `{st.session_state.presentation_path}`")
 
+    # Profile of the run, if it was profiled
+    if st.session_state.profile_report_path and os.path.exists(st.session_state.profile_report_path):
+        with st.expander("⏱️ Profile"):
+            with open(st.session_state.profile_report_path) as f:
+                profile_report = json.load(f)
+            lag_col, block_col = st.columns(2)
+            lag_col.metric("Event-loop lag p99", f"{profile_report['loop_lag_ms']['p99']:.0f} ms")
+            block_col.metric("Blocking calls", len(profile_report["blocking_events"]))
+            st.json(profile_report, expanded=False)
+            flamegraph_path = os.path.join(os.path.dirname(st.session_state.profile_report_path), "flamegraph.svg")
+            if os.path.exists(flamegraph_path):
+                with open(flamegraph_path, "rb") as f:
+                    st.download_button("Download flame graph", f.read(), file_name="flamegraph.svg", mime="image/svg+xml")
+
 # Footer
 st.markdown("---")
 st.markdown(
@@ -0,0 +1,246 @@
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+
+
+# Artifact store
+# Every run gets its own workspace directory under the store root, so concurrent runs
+# never overwrite each other's image.png / graph.png / deck.pptx. A background thread
+# removes finished workspaces once they are too old or the store grows over its quota.
+
+LOCK_FILE = ".active"
+
+
+def _safe_name(name: str, default: str = "artifact") -> str:
+    name = Path(str(name)).name  # drop any directory part chosen by the model
+    name = re.sub(r'[^A-Za-z0-9._-]+', '_', name).strip('._')
+    return name or default
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                total += os.path.getsize(os.path.join(root, file))
+            except OSError:
+                pass
+    return total
+
+
+class Workspace:
+    """
+    Isolated directory for the artifacts of one run.
+    """
+    def __init__(self, store: "ArtifactStore", run_id: str, path: Path):
+        self.store = store
+        self.run_id = run_id
+        self.path = path
+        self.manifest: list[dict] = []
+        # namespace for the exec based tools, shared by the calls of one run only
+        self.namespace: dict = {}
+        self._lock = threading.Lock()
+
+    def path_for(self, name: str, kind: str = "file") -> Path:
+        """Reserve a collision-free path for a new artifact and record it in the manifest"""
+        name = _safe_name(name)
+        stem, suffix = os.path.splitext(name)
+        with self._lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            counter = 0
+            while True:
+                candidate = self.path / (name if counter == 0 else f"{stem}_{counter}{suffix}")
+                try:
+                    # O_EXCL makes the reservation atomic even across processes
+                    os.close(os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                    break
+                except FileExistsError:
+                    counter += 1
+            self.manifest.append({
+                "name": candidate.name,
+                "path": str(candidate),
+                "kind": kind,
+                "created": datetime.now().isoformat(timespec="seconds"),
+            })
+        return candidate
+
+    def adopt(self, src: str | os.PathLike, kind: str = "file") -> Path:
+        """Move a file written outside the workspace into it"""
+        dst = self.path_for(Path(src).name, kind)
+        shutil.move(os.fspath(src), dst)
+        return dst
+
+    def find(self, name: str) -> str | None:
+        """Path of the latest artifact with this name (as requested or as stored), if any"""
+        name = _safe_name(name)
+        stem, suffix = os.path.splitext(name)
+        with self._lock:
+            entries = list(self.manifest)
+        for entry in reversed(entries):
+            entry_stem, entry_suffix = os.path.splitext(entry["name"])
+            if entry["name"] == name or (entry_suffix == suffix and re.fullmatch(rf"{re.escape(stem)}_\d+", entry_stem)):
+                if os.path.isfile(entry["path"]):
+                    return entry["path"]
+        return None
+
+    def contains(self, path: str | os.PathLike) -> bool:
+        try:
+            Path(path).resolve().relative_to(self.path.resolve())
+            return True
+        except ValueError:
+            return False
+
+    def artifacts(self) -> list[dict]:
+        """Manifest entries with their current size, skipping reserved paths that were never written"""
+        with self._lock:
+            entries = list(self.manifest)
+        result = []
+        for entry in entries:
+            try:
+                size = os.path.getsize(entry["path"])
+            except OSError:
+                continue
+            if size == 0:
+                continue
+            result.append({**entry, "size": size})
+        return result
+
+    def heartbeat(self) -> None:
+        (self.path / LOCK_FILE).touch()
+
+    def close(self) -> None:
+        """Mark the workspace as finished so the garbage collector may remove it"""
+        self.store.release(self)
+
+
+class ArtifactStore:
+    """
+    Root directory holding one workspace per run, with size and age quotas.
+    """
+    def __init__(self, root: str | os.PathLike, max_bytes: int | None = None,
+                 max_age: float | None = None, gc_interval: float = 300.0):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.gc_interval = gc_interval
+        self._active: dict[str, Workspace] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._gc_thread: threading.Thread | None = None
+
+    def create_workspace(self, run_id: str | None = None) -> Workspace:
+        run_id = _safe_name(run_id) if run_id else f"{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:8]}"
+        path = self.root / run_id
+        path.mkdir(parents=True, exist_ok=True)
+        workspace = Workspace(self, run_id, path)
+        workspace.namespace["output_dir"] = str(path)
+        workspace.namespace["save_path"] = lambda name: str(workspace.path_for(name))
+        workspace.heartbeat()
+        with self._lock:
+            self._active[run_id] = workspace
+        return workspace
+
+    def release(self, workspace: Workspace) -> None:
+        with self._lock:
+            self._active.pop(workspace.run_id, None)
+        (workspace.path / LOCK_FILE).unlink(missing_ok=True)
+
+    def _is_active(self, path: Path, now: float) -> bool:
+        with self._lock:
+            if path.name in self._active:
+                return True
+        # workspaces of other processes stay protected while their lock file is fresh
+        try:
+            lock_age = now - (path / LOCK_FILE).stat().st_mtime
+        except OSError:
+            return False
+        return lock_age < max(self.gc_interval * 3, 60.0)
+
+    def collect_garbage(self) -> list[str]:
+        """Remove finished workspaces older than max_age, then the oldest ones until the store fits max_bytes"""
+        now = time.time()
+        with self._lock:
+            active = list(self._active.values())
+        for workspace in active:
+            workspace.heartbeat()
+
+        candidates = []
+        total = 0
+        for path in self.root.iterdir():
+            if not path.is_dir() or path.name.startswith("."):
+                continue
+            size = _dir_size(path)
+            total += size
+            if not self._is_active(path, now):
+                candidates.append((path.stat().st_mtime, size, path))
+        candidates.sort()
+
+        removed = []
+        for mtime, size, path in candidates:
+            too_old = self.max_age is not None and now - mtime > self.max_age
+            too_big = self.max_bytes is not None and total > self.max_bytes
+            if not (too_old or too_big):
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed.append(path.name)
+        return removed
+
+    def start_gc(self) -> None:
+        if self._gc_thread is not None or (self.max_bytes is None and self.max_age is None):
+            return
+        self._gc_thread = threading.Thread(target=self._gc_loop, name="artifact-gc", daemon=True)
+        self._gc_thread.start()
+
+    def stop_gc(self) -> None:
+        self._stop.set()
+        if self._gc_thread is not None:
+            self._gc_thread.join()
+            self._gc_thread = None
+
+    def _gc_loop(self) -> None:
+        while not self._stop.wait(self.gc_interval):
+            try:
+                removed = self.collect_garbage()
+                if removed:
+                    print(f"Artifact GC removed {len(removed)} workspaces")
+            except Exception as e:
+                print(f"Artifact GC failed: {e!r}")
+
+
+# workspace of the run executing in the current task/thread, tools resolve their output paths against it
+current_workspace: ContextVar[Workspace | None] = ContextVar("current_workspace", default=None)
+
+_default_store: ArtifactStore | None = None
+_default_store_lock = threading.Lock()
+
+
+def default_store() -> ArtifactStore:
+    """Process-wide store configured from ARTIFACTS_DIR, ARTIFACTS_MAX_MB and ARTIFACTS_MAX_AGE_HOURS"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            max_mb = float(os.getenv("ARTIFACTS_MAX_MB", "1024"))
+            max_age_hours = float(os.getenv("ARTIFACTS_MAX_AGE_HOURS", "24"))
+            _default_store = ArtifactStore(
+                os.getenv("ARTIFACTS_DIR", "artifacts"),
+                max_bytes=int(max_mb * 1024 * 1024),
+                max_age=max_age_hours * 3600,
+            )
+            _default_store.start_gc()
+        return _default_store
+
+
+def artifact_path(name: str, kind: str = "file") -> Path:
+    """Collision-free path in the current run workspace, or the plain name when no run is active"""
+    workspace = current_workspace.get()
+    if workspace is None:
+        return Path(name)
+    return workspace.path_for(name, kind)
@@ -0,0 +1,216 @@
+"""
+Batch runner to generate many presentations from a manifest.
+
+The manifest is a JSONL or CSV file with one job per line/row and the fields:
+    job_id (optional), user_query, context (optional), csv_path (optional), user_id (optional)
+
+Usage:
+    python batch.py manifest.jsonl --output-dir decks --concurrency 4
+
+Every job writes into <output-dir>/<job_id>/. A job counts as done once its
+result.json exists, so re-running the same manifest skips finished jobs.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+from cache import configure_caches, cache_stats
+from metrics import summarize_latencies
+from plan_library import plan_library
+from artifacts import ArtifactStore
+
+
+RESULT_FILE = "result.json"
+REPORT_FILE = "batch_report.json"
+
+
+@dataclass
+class BatchJob:
+    job_id: str
+    user_query: str
+    context: str = ""
+    csv_path: str = ""
+    user_id: str = "batch"
+
+
+@dataclass
+class JobResult:
+    job_id: str
+    status: str  # done, skipped or failed
+    latency: float = 0.0
+    output_dir: str = ""
+    presentation_path: str = ""
+    slides_count: int = 0
+    error: str = ""
+
+
+def _safe_job_id(job_id: str) -> str:
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', job_id).strip('._') or "job"
+
+
+def load_manifest(path: str | os.PathLike) -> list[BatchJob]:
+    """Read the jobs from a .jsonl or .csv manifest"""
+    path = Path(path)
+    if path.suffix.lower() == ".csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        rows = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    rows.append(json.loads(line))
+
+    jobs = []
+    seen = set()
+    for i, row in enumerate(rows, start=1):
+        user_query = (row.get("user_query") or row.get("query") or "").strip()
+        if not user_query:
+            raise ValueError(f"Manifest entry {i} in {path} has no user_query")
+        job_id = _safe_job_id(str(row.get("job_id") or f"job-{i:05d}"))
+        if job_id in seen:
+            raise ValueError(f"Duplicate job_id {job_id!r} in {path}")
+        seen.add(job_id)
+        jobs.append(BatchJob(
+            job_id=job_id,
+            user_query=user_query,
+            context=row.get("context") or "",
+            csv_path=row.get("csv_path") or "",
+            user_id=row.get("user_id") or "batch",
+        ))
+    return jobs
+
+
+def job_is_complete(job_dir: Path) -> bool:
+    return (job_dir / RESULT_FILE).exists()
+
+
+def _write_json(path: Path, data) -> None:
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _collect_outputs(state, workspace) -> str:
+    """Move a deck saved outside the job workspace into it, return the deck path"""
+    deck = state.complete_presentation_path
+    if deck and os.path.isfile(deck) and not workspace.contains(deck):
+        return str(workspace.adopt(deck, "presentation"))
+    return deck
+
+
+async def run_job(job: BatchJob, store: ArtifactStore, semaphore: asyncio.Semaphore) -> JobResult:
+    from agent import run_full_agent_async
+
+    job_dir = store.root / job.job_id
+    if job_is_complete(job_dir):
+        return JobResult(job_id=job.job_id, status="skipped", output_dir=str(job_dir))
+
+    async with semaphore:
+        # the job directory is the run workspace, so all images, graphs and the deck land in it
+        workspace = store.create_workspace(job.job_id)
+        start = time.perf_counter()
+        try:
+            state = await run_full_agent_async(
+                user_query=job.user_query,
+                user_id=job.user_id,
+                context=job.context,
+                csv_path=job.csv_path,
+                workspace=workspace,
+            )
+            presentation_path = _collect_outputs(state, workspace)
+        except Exception as e:
+            latency = time.perf_counter() - start
+            print(f'[batch] {job.job_id} failed after {latency:.1f}s: {e!r}')
+            return JobResult(job_id=job.job_id, status="failed", latency=latency,
+                             output_dir=str(job_dir), error=repr(e))
+        finally:
+            workspace.close()
+        latency = time.perf_counter() - start
+
+    result = JobResult(
+        job_id=job.job_id,
+        status="done",
+        latency=latency,
+        output_dir=str(job_dir),
+        presentation_path=presentation_path,
+        slides_count=len(state.presentation_slides),
+    )
+    # result.json is written last, it marks the job as complete
+    _write_json(job_dir / RESULT_FILE, {
+        **asdict(result),
+        "job": asdict(job),
+        "slides": [slide.model_dump() for slide in state.presentation_slides],
+        "artifacts": workspace.artifacts(),
+    })
+    print(f'[batch] {job.job_id} done in {latency:.1f}s')
+    return result
+
+
+def build_report(results: list[JobResult], wall_time: float, concurrency: int) -> dict:
+    done = [r for r in results if r.status == "done"]
+    failed = [r for r in results if r.status == "failed"]
+    skipped = [r for r in results if r.status == "skipped"]
+    return {
+        "jobs": len(results),
+        "done": len(done),
+        "failed": len(failed),
+        "skipped": len(skipped),
+        "concurrency": concurrency,
+        "wall_time": wall_time,
+        "throughput_per_minute": len(done) / wall_time * 60 if wall_time else 0.0,
+        "latency": summarize_latencies([r.latency for r in done]),
+        "caches": cache_stats(),
+        "plans": plan_library.stats(),
+        "failures": {r.job_id: r.error for r in failed},
+    }
+
+
+async def run_batch(jobs: list[BatchJob], output_dir: str | os.PathLike, concurrency: int = 4,
+                    cache_dir: str | os.PathLike | None = None) -> dict:
+    """Run all jobs with at most `concurrency` generations in flight and return the report"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    cache_dir = Path(cache_dir) if cache_dir is not None else output_dir / ".cache"
+    configure_caches(cache_dir)
+    plan_library.configure(cache_dir / "plans.json")
+
+    # no quotas: batch outputs are kept until the caller removes them
+    store = ArtifactStore(output_dir)
+    semaphore = asyncio.Semaphore(concurrency)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run_job(job, store, semaphore) for job in jobs))
+    wall_time = time.perf_counter() - start
+
+    report = build_report(list(results), wall_time, concurrency)
+    _write_json(output_dir / REPORT_FILE, report)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate presentations for every job in a manifest")
+    parser.add_argument("manifest", help="JSONL or CSV manifest of jobs")
+    parser.add_argument("--output-dir", default="batch_output", help="Directory for the per-job outputs")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum number of jobs running at once")
+    parser.add_argument("--cache-dir", default=None, help="Shared cache directory (default: <output-dir>/.cache)")
+    args = parser.parse_args()
+
+    jobs = load_manifest(args.manifest)
+    report = asyncio.run(run_batch(jobs, args.output_dir, args.concurrency, args.cache_dir))
+
+    print('\n\n')
+    print(f'Jobs: {report["jobs"]} (done {report["done"]}, skipped {report["skipped"]}, failed {report["failed"]})')
+    print(f'Throughput: {report["throughput_per_minute"]:.2f} decks/min')
+    print(f'Latency p50/p95: {report["latency"]["p50"]:.1f}s / {report["latency"]["p95"]:.1f}s')
+    print(f'Report: {Path(args.output_dir) / REPORT_FILE}')
+
+
+if __name__ == "__main__":
+    main()
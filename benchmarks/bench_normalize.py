@@ -0,0 +1,100 @@
+"""
+Micro-benchmark of the scraped page normalization.
+
+Compares the previous per-line implementation of web_scraper with text_normalize on the
+HTML fixture corpus in benchmarks/fixtures, and reports throughput in MB/s.
+
+Usage:
+    python benchmarks/bench_normalize.py --repeat 20 --words 750
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from text_normalize import html_to_text, normalize_text, normalize_batch  # noqa: E402
+
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+
+def legacy_normalize(page_content: str, words_per_url: int) -> str:
+    """The cleaning loop web_scraper used before text_normalize"""
+    # Remove HTML/XML tags first
+    content = re.sub(r'<[^>]+>', '', page_content)
+
+    # Split into paragraphs
+    paragraphs = content.split('\n')
+    clean_paragraphs = []
+
+    for p in paragraphs:
+        # Remove special characters and normalize spaces
+        cleaned = re.sub(r'[^\w\s]', '', p)  # Keep only alphanumeric and spaces
+        cleaned = re.sub(r'\s+', ' ', cleaned).strip()  # Normalize to single spaces
+        cleaned = re.sub(r'[^a-zA-Z0-9\s]', '', cleaned)  # Remove non-English characters
+
+        # Only keep paragraphs relevant to the query
+        if len(cleaned.split()) > 10 and cleaned:
+            clean_paragraphs.append(cleaned)
+
+    filtered_content = ' '.join(clean_paragraphs)  # Join all paragraphs into single text
+    return ' '.join(filtered_content.split()[:words_per_url])  # Take exact number of words needed
+
+
+def load_corpus() -> dict[str, str]:
+    return {path.name: path.read_text(encoding="utf-8") for path in sorted(FIXTURES_DIR.glob("*.html"))}
+
+
+def measure(func, documents: list[str], words: int, repeat: int) -> float:
+    """Best throughput in MB/s over `repeat` passes over the documents"""
+    size_mb = sum(len(d.encode("utf-8")) for d in documents) / (1024 * 1024)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for document in documents:
+            func(document, words)
+        best = min(best, time.perf_counter() - start)
+    return size_mb / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scraped page normalization")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed passes over the corpus (best is reported)")
+    parser.add_argument("--words", type=int, default=750, help="Words kept per document (3000 words / 4 urls)")
+    parser.add_argument("--all-words", action="store_true", help="Keep every word, disables the early exit")
+    parser.add_argument("--batch-copies", type=int, default=64, help="Copies of the corpus for the process pool run")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    raw = list(corpus.values())
+    # WebBaseLoader hands web_scraper the page text, not the markup
+    texts = [html_to_text(document) for document in raw]
+    words = sys.maxsize if args.all_words else args.words
+
+    for name, document in corpus.items():
+        for content in (document, html_to_text(document)):
+            assert normalize_text(content, words) == legacy_normalize(content, words), f"output differs for {name}"
+
+    print(f"Corpus: {len(raw)} documents, {sum(len(d) for d in raw) / 1024:.0f} KB html, "
+          f"{sum(len(t) for t in texts) / 1024:.0f} KB text, words kept: {'all' if args.all_words else words}")
+    print(f"{'input':<12} {'legacy MB/s':>12} {'single-pass MB/s':>17} {'speedup':>8}")
+    for label, documents in (("page text", texts), ("raw html", raw)):
+        legacy = measure(legacy_normalize, documents, words, args.repeat)
+        single = measure(normalize_text, documents, words, args.repeat)
+        print(f"{label:<12} {legacy:>12.1f} {single:>17.1f} {single / legacy:>7.1f}x")
+
+    batch = raw * args.batch_copies
+    size_mb = sum(len(d.encode("utf-8")) for d in batch) / (1024 * 1024)
+    for processes in sorted({1, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        normalize_batch(batch, words, is_html=True, processes=processes)
+        elapsed = time.perf_counter() - start
+        print(f"html_to_text + normalize, {len(batch)} docs, {processes} process(es): {size_mb / elapsed:.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
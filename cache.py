@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+
+# Shared caches for search, scrape, image and model calls.
+# They live at module level so every run inside one process (the Streamlit app,
+# the batch runner, ...) reuses the same entries. Tools run in worker threads,
+# so every access goes through a lock.
+
+class ToolCache:
+    """
+    In-memory LRU cache with an optional on-disk layer shared between processes.
+    """
+    def __init__(self, name: str, max_entries: int = 1024):
+        self.name = name
+        self.max_entries = max_entries
+        self.directory: Path | None = None
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, object] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(*args, **kwargs) -> str:
+        """Build a stable key from the call arguments"""
+        payload = json.dumps([args, kwargs], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            directory = self.directory
+
+        value = None
+        if directory is not None:
+            try:
+                with open(directory / f"{key}.pkl", "rb") as f:
+                    value = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                value = None
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, value)
+            return value
+
+    def set(self, key: str, value) -> None:
+        with self._lock:
+            self._store(key, value)
+            directory = self.directory
+
+        if directory is not None:
+            # write to a temporary file first so concurrent readers never see a partial entry
+            tmp_path = directory / f"{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    pickle.dump(value, f)
+                os.replace(tmp_path, directory / f"{key}.pkl")
+            except OSError:
+                tmp_path.unlink(missing_ok=True)
+
+    def _store(self, key: str, value) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+search_cache = ToolCache("search")
+scrape_cache = ToolCache("scrape")
+image_cache = ToolCache("image", max_entries=128)
+llm_cache = ToolCache("llm")
+
+ALL_CACHES = [search_cache, scrape_cache, image_cache, llm_cache]
+
+
+def configure_caches(cache_dir: str | os.PathLike | None) -> None:
+    """Persist all caches under cache_dir (one sub-directory per cache), or keep them in memory only if None"""
+    for cache in ALL_CACHES:
+        if cache_dir is None:
+            cache.directory = None
+            continue
+        directory = Path(cache_dir) / cache.name
+        directory.mkdir(parents=True, exist_ok=True)
+        cache.directory = directory
+
+
+def cache_stats() -> dict:
+    return {cache.name: cache.stats() for cache in ALL_CACHES}
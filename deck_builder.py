@@ -0,0 +1,193 @@
+import asyncio
+import os
+import threading
+from pathlib import Path
+from typing import Callable
+
+from PIL import Image
+from pptx import Presentation
+from pptx.util import Inches, Pt
+
+from artifacts import Workspace
+from profiling import track_run_thread
+
+
+# Incremental deck assembly
+# Every finished slide is post-processed (images checked and downscaled) and rendered into
+# the deck in a worker thread while the next slides are still being researched. After each
+# slide a partial deck is saved atomically, so it can be downloaded during the generation.
+
+SLIDE_WIDTH = Inches(13.333)
+SLIDE_HEIGHT = Inches(7.5)
+MARGIN = Inches(0.5)
+HEADER_HEIGHT = Inches(1.0)
+TITLE_SIZE = Pt(24)
+TEXT_SIZE = Pt(16)
+BULLET_SIZE = Pt(14)
+TABLE_SIZE = Pt(12)
+MAX_IMAGE_PX = 1600
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp"}
+
+
+def prepare_image(path: str, workspace: Workspace | None = None, max_px: int = MAX_IMAGE_PX) -> tuple[str, int, int] | None:
+    """
+    Resolve a slide image and downscale it if needed, return (path, width, height) or None if unusable.
+
+    The model sometimes reports the requested file name instead of the collision-free one
+    from the workspace, so names are also looked up in the workspace manifest.
+    """
+    if not path or Path(path).suffix.lower() not in IMAGE_EXTENSIONS:
+        return None
+    if not os.path.isfile(path) and workspace is not None:
+        path = workspace.find(Path(path).name) or path
+    if not os.path.isfile(path):
+        return None
+
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+            if max(width, height) <= max_px:
+                return path, width, height
+            img.thumbnail((max_px, max_px))
+            target_name = f"{Path(path).stem}_slide.png"
+            target = workspace.path_for(target_name, "image") if workspace else Path(path).with_name(target_name)
+            img.save(target, format="PNG")
+            return str(target), img.size[0], img.size[1]
+    except OSError:
+        return None
+
+
+class IncrementalDeckBuilder:
+    """
+    Widescreen deck built one slide at a time: title on top, text or bullets on the left,
+    image, graph or table on the right.
+    """
+    def __init__(self, path: str | os.PathLike, workspace: Workspace | None = None):
+        self.path = Path(path)
+        self.workspace = workspace
+        self.presentation = Presentation()
+        self.presentation.slide_width = SLIDE_WIDTH
+        self.presentation.slide_height = SLIDE_HEIGHT
+        self.slides_rendered = 0
+
+    def add_slide(self, slide) -> None:
+        pptx_slide = self.presentation.slides.add_slide(self.presentation.slide_layouts[6])  # blank layout
+        body_top = MARGIN + HEADER_HEIGHT
+        body_height = SLIDE_HEIGHT - body_top - MARGIN
+        column_width = (SLIDE_WIDTH - 3 * MARGIN) // 2
+
+        header = pptx_slide.shapes.add_textbox(MARGIN, MARGIN, SLIDE_WIDTH - 2 * MARGIN, HEADER_HEIGHT)
+        header.text_frame.word_wrap = True
+        header.text_frame.text = slide.title
+        header.text_frame.paragraphs[0].font.size = TITLE_SIZE
+        header.text_frame.paragraphs[0].font.bold = True
+
+        image = prepare_image(slide.image_path, self.workspace) or prepare_image(slide.graph_path, self.workspace)
+        has_right = image is not None or bool(slide.table_data)
+        left_width = column_width if has_right else SLIDE_WIDTH - 2 * MARGIN
+
+        body = pptx_slide.shapes.add_textbox(MARGIN, body_top, left_width, body_height)
+        text_frame = body.text_frame
+        text_frame.word_wrap = True
+        paragraph = text_frame.paragraphs[0]
+        if slide.text_content:
+            paragraph.text = slide.text_content
+            paragraph.font.size = TEXT_SIZE
+            paragraph = None
+        for bullet in slide.bullets:
+            paragraph = paragraph if paragraph is not None else text_frame.add_paragraph()
+            paragraph.text = f"• {bullet}"
+            paragraph.font.size = BULLET_SIZE
+            paragraph = None
+
+        right_left = 2 * MARGIN + column_width
+        if image is not None:
+            path, width, height = image
+            # fit into the right column keeping the aspect ratio
+            scale = min(column_width / width, body_height / height)
+            pptx_slide.shapes.add_picture(path, right_left, body_top, width=int(width * scale), height=int(height * scale))
+        elif slide.table_data:
+            self._add_table(pptx_slide, slide.table_data, right_left, body_top, column_width, body_height)
+
+        self.slides_rendered += 1
+
+    def _add_table(self, pptx_slide, table_data: dict, left, top, width, height) -> None:
+        columns = list(table_data)
+        rows = max((len(values) for values in table_data.values()), default=0)
+        row_height = min(Inches(0.4), height // (rows + 1))
+        table = pptx_slide.shapes.add_table(rows + 1, len(columns), left, top, width, row_height * (rows + 1)).table
+        for c, column in enumerate(columns):
+            table.cell(0, c).text = str(column)
+            for r, value in enumerate(table_data[column], start=1):
+                table.cell(r, c).text = f"{value:,.2f}".rstrip("0").rstrip(".") if isinstance(value, float) else str(value)
+        for row in table.rows:
+            for cell in row.cells:
+                for paragraph in cell.text_frame.paragraphs:
+                    paragraph.font.size = TABLE_SIZE
+
+    def save(self) -> str:
+        """Write the deck atomically, readers never see a half written file"""
+        tmp_path = self.path.with_name(f".{self.path.name}.{threading.get_ident()}.tmp")
+        self.presentation.save(tmp_path)
+        os.replace(tmp_path, self.path)
+        return str(self.path)
+
+
+class DeckPipeline:
+    """
+    Renders slides into an IncrementalDeckBuilder as they are produced.
+
+    Slides may be submitted out of order (e.g. from parallel workers), they are rendered
+    in index order. on_update(partial_deck_path, slides_rendered) is called on the event
+    loop after every saved partial deck.
+    """
+    def __init__(self, path: str | os.PathLike, workspace: Workspace | None = None,
+                 on_update: Callable[[str, int], None] | None = None):
+        self.builder = IncrementalDeckBuilder(path, workspace)
+        self.on_update = on_update
+        self.error: BaseException | None = None
+        self._pending: dict[int, object] = {}
+        self._next_index = 0
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def submit(self, index: int, slide) -> None:
+        self._queue.put_nowait((index, slide))
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            index, slide = item
+            self._pending[index] = slide
+            while self._next_index in self._pending and self.error is None:
+                slide = self._pending.pop(self._next_index)
+                try:
+                    path = await asyncio.to_thread(self._render, slide)
+                except Exception as e:
+                    print(f"Rendering slide {self._next_index + 1} failed: {e!r}")
+                    self.error = e
+                    break
+                self._next_index += 1
+                if self.on_update is not None:
+                    try:
+                        self.on_update(path, self.builder.slides_rendered)
+                    except Exception as e:
+                        print(f"Deck update callback failed: {e!r}")
+
+    @track_run_thread
+    def _render(self, slide) -> str:
+        self.builder.add_slide(slide)
+        return self.builder.save()
+
+    def cancel(self) -> None:
+        self._task.cancel()
+
+    async def finish(self) -> str | None:
+        """Wait for all submitted slides, return the deck path or None if rendering failed"""
+        self._queue.put_nowait(None)
+        await self._task
+        if self.error is not None or self._pending or self.builder.slides_rendered == 0:
+            return None
+        return str(self.builder.path)
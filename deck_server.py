@@ -0,0 +1,78 @@
+import os
+import secrets
+import shutil
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote
+
+
+# Lightweight local file endpoint for generated decks.
+# Decks are streamed from the artifact location in chunks, so the app process never
+# holds a whole deck in memory to offer it for download.
+
+PPTX_MIME = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+CHUNK_SIZE = 256 * 1024
+
+
+class DeckServer:
+    """
+    Serves registered files under /deck/<token> from a background thread.
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, public_url: str | None = None):
+        self._files: dict[str, tuple[str, str]] = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self.host, self.port = self._httpd.server_address[:2]
+        self.public_url = (public_url or f"http://{host}:{self.port}").rstrip("/")
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "DeckServer":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._httpd.serve_forever, name="deck-server", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread = None
+
+    def register(self, path: str, download_name: str) -> str:
+        """Make a file downloadable and return its url, the token is unguessable"""
+        token = secrets.token_urlsafe(16)
+        with self._lock:
+            self._files[token] = (os.path.abspath(path), download_name)
+        return f"{self.public_url}/deck/{token}"
+
+    def unregister(self, url: str) -> None:
+        with self._lock:
+            self._files.pop(url.rsplit("/", 1)[-1], None)
+
+    def _lookup(self, token: str) -> tuple[str, str] | None:
+        with self._lock:
+            return self._files.get(token)
+
+    def _make_handler(self):
+        server = self
+
+        class DeckRequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                prefix, _, token = self.path.partition("/deck/")
+                entry = server._lookup(token) if prefix == "" else None
+                if entry is None or not os.path.isfile(entry[0]):
+                    self.send_error(404)
+                    return
+                path, download_name = entry
+                with open(path, "rb") as f:
+                    self.send_response(200)
+                    self.send_header("Content-Type", PPTX_MIME)
+                    self.send_header("Content-Length", str(os.fstat(f.fileno()).st_size))
+                    self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{quote(download_name)}")
+                    self.end_headers()
+                    shutil.copyfileobj(f, self.wfile, CHUNK_SIZE)
+
+            def log_message(self, format, *args):
+                pass
+
+        return DeckRequestHandler
@@ -0,0 +1,259 @@
+import base64
+import json
+import random
+import threading
+import time
+import uuid
+import zlib
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Local fake OpenAI, Tavily and Gemini endpoints
+# Used by loadtest.py (and for offline runs in general) to exercise the full agent graph
+# without network access. Every endpoint has its own latency and error distribution.
+
+# 1x1 transparent PNG returned as the "generated" image
+FAKE_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+)
+
+
+@dataclass
+class EndpointProfile:
+    """
+    Latency and error distribution of one fake endpoint.
+
+    distribution is one of fixed, uniform (latency +/- jitter) or lognormal (median latency, sigma jitter).
+    """
+    latency: float = 0.2
+    jitter: float = 0.0
+    distribution: str = "fixed"
+    error_rate: float = 0.0
+    error_status: int = 500
+
+    def sample_latency(self, rng: random.Random) -> float:
+        if self.distribution == "uniform":
+            return max(0.0, rng.uniform(self.latency - self.jitter, self.latency + self.jitter))
+        if self.distribution == "lognormal":
+            return rng.lognormvariate(0.0, self.jitter) * self.latency
+        return self.latency
+
+    def should_fail(self, rng: random.Random) -> bool:
+        return self.error_rate > 0 and rng.random() < self.error_rate
+
+
+def example_from_schema(schema: dict, defs: dict | None = None, list_length: int = 3):
+    """Build a value that validates against a JSON schema, preferring the declared defaults"""
+    defs = defs if defs is not None else schema.get("$defs", {})
+    if "$ref" in schema:
+        return example_from_schema(defs[schema["$ref"].rsplit("/", 1)[-1]], defs, list_length)
+    if "default" in schema:
+        return schema["default"]
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            options = [s for s in schema[key] if s.get("type") != "null"] or schema[key]
+            return example_from_schema(options[0], defs, list_length)
+    if "enum" in schema:
+        return schema["enum"][0]
+
+    schema_type = schema.get("type", "object")
+    if schema_type == "object":
+        properties = schema.get("properties", {})
+        return {name: example_from_schema(prop, defs, list_length) for name, prop in properties.items()}
+    if schema_type == "array":
+        return [example_from_schema(schema.get("items", {}), defs, list_length) for _ in range(list_length)]
+    if schema_type == "string":
+        return f"Fake {schema.get('title', 'text').lower()}"
+    if schema_type == "integer":
+        return 1
+    if schema_type == "number":
+        return 1.0
+    if schema_type == "boolean":
+        return True
+    return None
+
+
+class FakeProviders:
+    """
+    One local HTTP server routing OpenAI chat completions, Tavily search and Gemini generateContent.
+
+    tool_calls lists the tools the fake model calls (once each, in order) before answering,
+    supported are get_source_url and generate_and_save_image.
+    """
+    def __init__(self, openai: EndpointProfile | None = None, tavily: EndpointProfile | None = None,
+                 gemini: EndpointProfile | None = None, tool_calls: tuple[str, ...] = (),
+                 slides_per_deck: int = 3, seed: int | None = None, host: str = "127.0.0.1", port: int = 0):
+        self.profiles = {
+            "openai": openai or EndpointProfile(),
+            "tavily": tavily or EndpointProfile(latency=0.3),
+            "gemini": gemini or EndpointProfile(latency=1.0),
+        }
+        self.tool_calls = tuple(tool_calls)
+        self.slides_per_deck = slides_per_deck
+        self.requests = {name: 0 for name in self.profiles}
+        self.errors = {name: 0 for name in self.profiles}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self.url = f"http://{host}:{self._httpd.server_address[1]}"
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "FakeProviders":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-providers", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread = None
+
+    def environment(self) -> dict[str, str]:
+        """Environment variables pointing the OpenAI, Tavily and Gemini clients at this server"""
+        return {
+            "OPENAI_BASE_URL": f"{self.url}/v1",
+            "OPENAI_API_KEY": "fake-openai-key",
+            "TAVILY_API_BASE_URL": f"{self.url}/tavily",
+            "TAVILY_API_KEY": "fake-tavily-key",
+            "GOOGLE_GENAI_BASE_URL": f"{self.url}/gemini",
+            "GOOGLE_GENAI_KEY": "fake-gemini-key",
+            "LOGFIRE_SEND_TO_LOGFIRE": "false",
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"requests": dict(self.requests), "errors": dict(self.errors)}
+
+    def _sample(self, endpoint: str) -> tuple[float, bool]:
+        profile = self.profiles[endpoint]
+        with self._lock:
+            self.requests[endpoint] += 1
+            latency = profile.sample_latency(self._rng)
+            failed = profile.should_fail(self._rng)
+            if failed:
+                self.errors[endpoint] += 1
+        return latency, failed
+
+    # responses
+
+    def _chat_completion(self, body: dict) -> dict:
+        tools = {t["function"]["name"]: t["function"] for t in body.get("tools", [])}
+        messages = body.get("messages", [])
+        called = {
+            call["function"]["name"]
+            for message in messages if message.get("role") == "assistant"
+            for call in message.get("tool_calls") or []
+        }
+
+        # arguments differ per request like real ones, so the tool caches don't answer every
+        # call after the first and the fake Tavily/Gemini endpoints see the real load
+        user_text = next((m.get("content") for m in reversed(messages) if m.get("role") == "user"), "")
+        topic = " ".join((user_text if isinstance(user_text, str) else json.dumps(user_text)).split()[:12])
+        request_tag = uuid.uuid4().hex[:8]
+
+        tool_call = None
+        for name in self.tool_calls:
+            if name in tools and name not in called:
+                if name == "get_source_url":
+                    arguments = {"query": f"fake research {request_tag}: {topic}"}
+                else:
+                    arguments = {"prompt": f"fake illustration {request_tag}: {topic}", "filename": "image.png"}
+                tool_call = (name, arguments)
+                break
+
+        if tool_call is None:
+            output_tools = [name for name in tools if name.startswith("final_result")]
+            if output_tools:
+                parameters = tools[output_tools[0]].get("parameters", {})
+                tool_call = (output_tools[0], example_from_schema(parameters, list_length=self.slides_per_deck))
+
+        if tool_call is None:
+            message = {"role": "assistant", "content": "Fake response"}
+            finish_reason = "stop"
+        else:
+            message = {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{
+                    "id": f"call_{uuid.uuid4().hex[:12]}",
+                    "type": "function",
+                    "function": {"name": tool_call[0], "arguments": json.dumps(tool_call[1])},
+                }],
+            }
+            finish_reason = "tool_calls"
+
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150},
+        }
+
+    def _tavily_search(self, body: dict) -> dict:
+        return {
+            "query": body.get("query", ""),
+            "results": [
+                {"title": f"Fake result {i}", "url": f"https://example.com/fake/{zlib.crc32(body.get('query', '').encode())}/{i}",
+                 "content": "Fake content", "score": 0.9}
+                for i in range(body.get("max_results", 4))
+            ],
+            "images": [],
+            "response_time": 0.0,
+        }
+
+    def _gemini_generate(self, body: dict) -> dict:
+        return {
+            "candidates": [{
+                "content": {
+                    "role": "model",
+                    "parts": [{"inlineData": {"mimeType": "image/png", "data": base64.b64encode(FAKE_PNG).decode()}}],
+                },
+                "finishReason": "STOP",
+            }],
+        }
+
+    def _make_handler(self):
+        providers = self
+
+        class FakeRequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+
+                if self.path.startswith("/v1/chat/completions"):
+                    endpoint, build = "openai", providers._chat_completion
+                elif self.path.startswith("/tavily/search"):
+                    endpoint, build = "tavily", providers._tavily_search
+                elif self.path.startswith("/gemini/") and ":generateContent" in self.path:
+                    endpoint, build = "gemini", providers._gemini_generate
+                else:
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+
+                latency, failed = providers._sample(endpoint)
+                time.sleep(latency)
+                if failed:
+                    status = providers.profiles[endpoint].error_status
+                    self._send_json(status, {"error": {"message": "Injected failure", "code": status}})
+                    return
+                self._send_json(200, build(body))
+
+            def _send_json(self, status: int, payload: dict):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return FakeRequestHandler
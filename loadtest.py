@@ -0,0 +1,280 @@
+"""
+Load test for the presentation generator against local fake providers.
+
+Drives N concurrent generations (either `run_full_agent_async` directly or the Streamlit
+UI flow of app.py) against fake OpenAI, Tavily and Gemini endpoints with configurable
+latency and error distributions, for increasing concurrency levels.
+
+Usage:
+    python loadtest.py --levels 1,2,4,8,16 --runs-per-user 2 --llm-latency 0.5 --llm-error-rate 0.02
+    python loadtest.py --mode ui --levels 1,2,4
+
+Reports per level: throughput, p50/p95/p99 latency, event-loop lag, memory growth and failure rate.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from fake_providers import FakeProviders, EndpointProfile
+from plan_library import plan_library
+from metrics import percentile, summarize_latencies
+
+
+DEFAULT_QUERY = "Generate a presentation on renewable energy adoption"
+
+
+def current_rss_mb() -> float:
+    """Current resident set size, falls back to the peak RSS where /proc is not available"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up from a short sleep.
+    """
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.samples: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval))
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def summary(self) -> dict:
+        return {
+            "p50": percentile(self.samples, 50),
+            "p99": percentile(self.samples, 99),
+            "max": max(self.samples, default=0.0),
+        }
+
+
+@dataclass
+class LevelResult:
+    concurrency: int
+    runs: int = 0
+    failures: int = 0
+    wall_time: float = 0.0
+    latencies: list[float] = field(default_factory=list)
+    loop_lag: dict = field(default_factory=dict)
+    rss_start_mb: float = 0.0
+    rss_end_mb: float = 0.0
+    errors: dict = field(default_factory=dict)
+
+    def report(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "runs": self.runs,
+            "failures": self.failures,
+            "failure_rate": self.failures / self.runs if self.runs else 0.0,
+            "throughput_per_minute": (self.runs - self.failures) / self.wall_time * 60 if self.wall_time else 0.0,
+            "latency": summarize_latencies(self.latencies),
+            "loop_lag": self.loop_lag,
+            "rss_start_mb": self.rss_start_mb,
+            "rss_end_mb": self.rss_end_mb,
+            "rss_growth_mb": self.rss_end_mb - self.rss_start_mb,
+            "errors": self.errors,
+        }
+
+
+def _record_error(result: LevelResult, error: BaseException) -> None:
+    name = type(error).__name__
+    result.errors[name] = result.errors.get(name, 0) + 1
+    result.failures += 1
+
+
+async def run_agent_level(concurrency: int, runs_per_user: int, query: str) -> LevelResult:
+    """Closed loop: every simulated user runs its generations back to back"""
+    from agent import run_full_agent_async
+
+    result = LevelResult(concurrency=concurrency)
+    monitor = LoopLagMonitor()
+
+    async def user(user_index: int):
+        for i in range(runs_per_user):
+            # distinct queries so the planner cache doesn't hide the model latency, the fake model
+            # makes every tool call distinct for the search and image caches
+            user_query = f"{query} (user {user_index}, run {i}, level {concurrency})"
+            start = time.perf_counter()
+            try:
+                await run_full_agent_async(user_query=user_query, user_id=f"load-{user_index}")
+                result.latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                _record_error(result, e)
+            result.runs += 1
+
+    gc.collect()
+    result.rss_start_mb = current_rss_mb()
+    monitor.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(user(i) for i in range(concurrency)))
+    result.wall_time = time.perf_counter() - start
+    await monitor.stop()
+    gc.collect()
+    result.rss_end_mb = current_rss_mb()
+    result.loop_lag = monitor.summary()
+    return result
+
+
+def run_ui_level(concurrency: int, runs_per_user: int, query: str, timeout: float) -> LevelResult:
+    """Drives app.py through Streamlit's AppTest, one thread per simulated user"""
+    from streamlit.testing.v1 import AppTest
+
+    result = LevelResult(concurrency=concurrency)
+    lock = threading.Lock()
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+    def user(user_index: int):
+        for i in range(runs_per_user):
+            start = time.perf_counter()
+            try:
+                at = AppTest.from_file(app_path, default_timeout=timeout)
+                at.run()
+                at.text_area[0].input(f"{query} (user {user_index}, run {i}, level {concurrency})")
+                generate = next(b for b in at.button if "Generate Presentation" in b.label)
+                generate.click().run()
+                if at.exception or not at.session_state.generated:
+                    raise RuntimeError("Generation did not complete in the UI")
+                with lock:
+                    result.latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                with lock:
+                    _record_error(result, e)
+            with lock:
+                result.runs += 1
+
+    gc.collect()
+    result.rss_start_mb = current_rss_mb()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(user, range(concurrency)))
+    result.wall_time = time.perf_counter() - start
+    gc.collect()
+    result.rss_end_mb = current_rss_mb()
+    # every AppTest runs its own event loop, there is no single loop to monitor
+    result.loop_lag = {}
+    return result
+
+
+def print_table(reports: list[dict]) -> None:
+    header = f"{'conc':>5} {'runs':>5} {'fail%':>6} {'dpm':>8} {'p50':>7} {'p95':>7} {'p99':>7} {'lag99':>7} {'rss+MB':>7}"
+    print(header)
+    print("-" * len(header))
+    for r in reports:
+        lag = r["loop_lag"].get("p99")
+        print(
+            f"{r['concurrency']:>5} {r['runs']:>5} {r['failure_rate'] * 100:>5.1f}% "
+            f"{r['throughput_per_minute']:>8.2f} {r['latency']['p50']:>6.2f}s {r['latency']['p95']:>6.2f}s "
+            f"{r['latency']['p99']:>6.2f}s {(f'{lag * 1000:.0f}ms' if lag is not None else '-'):>7} "
+            f"{r['rss_growth_mb']:>7.1f}"
+        )
+
+
+async def run_agent_levels(levels: list[int], runs_per_user: int, query: str) -> list[LevelResult]:
+    # all levels share one event loop, the model clients are bound to the loop they first ran on
+    results = []
+    for level in levels:
+        print(f"Running concurrency level {level}...")
+        results.append(await run_agent_level(level, runs_per_user, query))
+    return results
+
+
+def _profile(args, name: str) -> EndpointProfile:
+    return EndpointProfile(
+        latency=getattr(args, f"{name}_latency"),
+        jitter=getattr(args, f"{name}_jitter"),
+        distribution=args.distribution,
+        error_rate=getattr(args, f"{name}_error_rate"),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the presentation generator against fake providers")
+    parser.add_argument("--mode", choices=["agent", "ui"], default="agent", help="Drive run_full_agent_async or the app.py UI flow")
+    parser.add_argument("--levels", default="1,2,4,8", help="Comma separated concurrency levels")
+    parser.add_argument("--runs-per-user", type=int, default=2, help="Generations per simulated user and level")
+    parser.add_argument("--query", default=DEFAULT_QUERY)
+    parser.add_argument("--slides", type=int, default=3, help="Slides planned by the fake model per deck")
+    parser.add_argument("--tool-calls", default="get_source_url,generate_and_save_image",
+                        help="Tools the fake model calls per slide (comma separated, empty for none)")
+    parser.add_argument("--distribution", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    for name, latency in (("llm", 0.5), ("tavily", 0.3), ("gemini", 1.0)):
+        parser.add_argument(f"--{name}-latency", type=float, default=latency, help=f"{name} latency in seconds")
+        parser.add_argument(f"--{name}-jitter", type=float, default=0.25, help=f"{name} latency jitter")
+        parser.add_argument(f"--{name}-error-rate", type=float, default=0.0, help=f"{name} fraction of failed requests")
+    parser.add_argument("--timeout", type=float, default=600.0, help="UI mode: timeout of one generation")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--report", default=None, help="Write the JSON report to this file")
+    parser.add_argument("--plan-reuse", action="store_true",
+                        help="Keep the plan library on (off by default, the run queries only differ by numbers)")
+    args = parser.parse_args()
+    plan_library.enabled = args.plan_reuse
+
+    providers = FakeProviders(
+        openai=_profile(args, "llm"),
+        tavily=_profile(args, "tavily"),
+        gemini=_profile(args, "gemini"),
+        tool_calls=tuple(t for t in args.tool_calls.split(",") if t),
+        slides_per_deck=args.slides,
+        seed=args.seed,
+    ).start()
+
+    # must be set before agent.py creates its clients
+    os.environ.update(providers.environment())
+    os.environ.setdefault("ARTIFACTS_DIR", tempfile.mkdtemp(prefix="loadtest_artifacts_"))
+
+    levels = [int(level) for level in args.levels.split(",")]
+    try:
+        if args.mode == "agent":
+            results = asyncio.run(run_agent_levels(levels, args.runs_per_user, args.query))
+        else:
+            results = []
+            for level in levels:
+                print(f"Running concurrency level {level}...")
+                results.append(run_ui_level(level, args.runs_per_user, args.query, args.timeout))
+        reports = [r.report() for r in results]
+    finally:
+        providers.stop()
+
+    print('\n')
+    print_table(reports)
+    print(f"\nProvider requests: {providers.stats()}")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"mode": args.mode, "levels": reports, "providers": providers.stats(),
+                       "arguments": vars(args)}, f, indent=2)
+        print(f"Report: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import math
+
+
+# Latency statistics shared by the batch runner, the load test and the profiler
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile, 0.0 for an empty list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = min(len(ordered), max(1, math.ceil(pct / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+def summarize_latencies(latencies: list[float]) -> dict:
+    return {
+        "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies, default=0.0),
+    }
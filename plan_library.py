@@ -0,0 +1,252 @@
+import csv
+import difflib
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+
+
+# Plan library
+# Past planner outputs indexed by an n-gram signature of the query, the context and the CSV
+# schema. The closest plan is handed to the planner as a template. Skipping the planner is
+# opt-in (skip_planner / PLAN_SKIP_PLANNER=1) and only for queries that differ from an earlier
+# one by numbers ("Q4 2024 sales review" after "Q3 2024 sales review"): names can't be told
+# apart from the topic ("Roman Empire" -> "Ottoman Empire"), so they always go to the planner.
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+# words keep inner punctuation ("U.S", "Q3-2024"), other punctuation is a token of its own
+_TOKEN_PATTERN = re.compile(r"[A-Za-z0-9](?:[\w&.'-]*[A-Za-z0-9])?|\S")
+
+# substitutions are limited to short spans of numbers ("Q3", "2024", "FY24")
+MAX_SUBSTITUTION_WORDS = 3
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "but", "of", "for", "to", "in", "on", "at", "by", "with", "about", "from",
+    "into", "over", "vs", "versus", "per", "as", "is", "are", "be", "this", "that", "these", "those", "my", "our",
+    "your", "their", "its", "it", "me", "us", "we", "i", "you", "all", "each", "not", "no", "between",
+}
+
+# weight of each field in the overall similarity
+FIELD_WEIGHTS = {"query": 0.6, "context": 0.25, "schema": 0.15}
+
+
+def csv_schema(csv_path: str) -> str:
+    """Header row of a CSV file, read without loading the data"""
+    if not csv_path or not os.path.isfile(csv_path):
+        return ""
+    try:
+        with open(csv_path, newline="", encoding="utf-8", errors="replace") as f:
+            return ",".join(next(csv.reader(f), []))
+    except (OSError, csv.Error):
+        return ""
+
+
+def signature(text: str) -> Counter:
+    """Word unigrams, word bigrams and character trigrams of a text"""
+    words = _WORD_PATTERN.findall(text.lower())
+    features = Counter(words)
+    features.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    joined = f" {' '.join(words)} "
+    features.update(f"#{joined[i:i + 3]}" for i in range(len(joined) - 2))
+    return features
+
+
+def cosine(a: Counter, b: Counter) -> float:
+    if not a and not b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    dot = sum(count * b[feature] for feature, count in a.items() if feature in b)
+    return dot / (math.sqrt(sum(c * c for c in a.values())) * math.sqrt(sum(c * c for c in b.values())))
+
+
+def _is_numeric_span(words: list[str]) -> bool:
+    """Short span whose every word contains a digit"""
+    if not words or len(words) > MAX_SUBSTITUTION_WORDS:
+        return False
+    return all(word.lower() not in STOPWORDS and any(c.isdigit() for c in word) for word in words)
+
+
+def query_substitutions(old: str, new: str, max_ratio: float) -> dict[str, str] | None:
+    """
+    Numbers replaced between two queries ({"Q3": "Q4"}), or None if the queries differ
+    otherwise or by more than max_ratio of their words.
+    """
+    old_words, new_words = _TOKEN_PATTERN.findall(old), _TOKEN_PATTERN.findall(new)
+    matcher = difflib.SequenceMatcher(a=[w.lower() for w in old_words], b=[w.lower() for w in new_words], autojunk=False)
+    substitutions = {}
+    changed = 0
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op == "equal":
+            continue
+        if op != "replace" or not (_is_numeric_span(old_words[i1:i2]) and _is_numeric_span(new_words[j1:j2])):
+            return None
+        substitutions[" ".join(old_words[i1:i2])] = " ".join(new_words[j1:j2])
+        changed += max(i2 - i1, j2 - j1)
+    if changed > max_ratio * max(len(old_words), len(new_words), 1):
+        return None
+    return substitutions
+
+
+def apply_substitutions(text: str, substitutions: dict[str, str]) -> str:
+    if not substitutions:
+        return text
+    # longest phrases first so "North America" wins over "America"
+    pattern = re.compile("|".join(rf"\b{re.escape(old)}\b" for old in sorted(substitutions, key=len, reverse=True)),
+                         re.IGNORECASE)
+    lowered = {old.lower(): new for old, new in substitutions.items()}
+    return pattern.sub(lambda m: lowered[m.group(0).lower()], text)
+
+
+@dataclass
+class PlanMatch:
+    plan: dict
+    mode: str  # "reuse": planner skipped, "adapt": plan given to the planner as a template
+    similarity: float
+    source_query: str
+    planning_seconds: float
+    substitutions: dict
+
+
+class PlanLibrary:
+    """
+    Thread-safe store of past plans with similarity lookup, optionally persisted to a JSON file.
+    """
+    def __init__(self, path: str | os.PathLike | None = None, reuse_threshold: float = 0.8,
+                 adapt_threshold: float = 0.6, max_substitution_ratio: float = 0.34, max_entries: int = 500,
+                 enabled: bool = True, skip_planner: bool = False):
+        self.enabled = enabled
+        self.skip_planner = skip_planner
+        self.reuse_threshold = reuse_threshold
+        self.adapt_threshold = adapt_threshold
+        self.max_substitution_ratio = max_substitution_ratio
+        self.max_entries = max_entries
+        self.path: Path | None = None
+        self.lookups = 0
+        self.reused = 0
+        self.adapted = 0
+        self.seconds_saved = 0.0
+        self._entries: list[dict] = []
+        self._signatures: list[dict[str, Counter]] = []
+        self._lock = threading.Lock()
+        self.configure(path)
+
+    def configure(self, path: str | os.PathLike | None) -> None:
+        """Persist the library to path (loading the plans already there), or keep it in memory only if None"""
+        with self._lock:
+            self.path = Path(path) if path is not None else None
+            if self.path is None or not self.path.is_file():
+                return
+            try:
+                entries = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                return
+            known = {(e["query"], e["context"], e["schema"]) for e in self._entries}
+            for entry in entries:
+                if (entry["query"], entry["context"], entry["schema"]) not in known:
+                    self._append(entry)
+
+    @staticmethod
+    def _signatures_of(query: str, context: str, schema: str) -> dict[str, Counter]:
+        return {"query": signature(query), "context": signature(context), "schema": signature(schema.replace(",", " "))}
+
+    @staticmethod
+    def _similarity(a: dict[str, Counter], b: dict[str, Counter]) -> tuple[float, dict[str, float]]:
+        fields = {name: cosine(a[name], b[name]) for name in FIELD_WEIGHTS}
+        # fields empty on both sides carry no information
+        weights = {name: w for name, w in FIELD_WEIGHTS.items() if a[name] or b[name]}
+        total = sum(weights.values())
+        return sum(fields[name] * w for name, w in weights.items()) / total if total else 1.0, fields
+
+    def _append(self, entry: dict) -> None:
+        self._entries.append(entry)
+        self._signatures.append(self._signatures_of(entry["query"], entry["context"], entry["schema"]))
+        if len(self._entries) > self.max_entries:
+            del self._entries[0], self._signatures[0]
+
+    def lookup(self, query: str, context: str = "", schema: str = "") -> PlanMatch | None:
+        """
+        Closest plan above the adapt threshold, to be used as a template by the planner ("adapt").
+
+        With skip_planner, a plan is reused as is ("reuse") when the query, context and schema
+        similarities are all at or above the reuse threshold and the query differs from the
+        stored one only by numbers, which are substituted in the plan.
+        """
+        if not self.enabled:
+            return None
+        wanted = self._signatures_of(query, context, schema)
+        with self._lock:
+            self.lookups += 1
+            scored = [(self._similarity(wanted, sig), entry) for sig, entry in zip(self._signatures, self._entries)]
+        if not scored:
+            return None
+        (similarity, fields), entry = max(scored, key=lambda item: item[0][0])
+        if similarity < self.adapt_threshold:
+            return None
+
+        substitutions = None
+        if self.skip_planner and min(similarity, fields["query"], fields["context"], fields["schema"]) >= self.reuse_threshold:
+            substitutions = query_substitutions(entry["query"], query, self.max_substitution_ratio)
+        if substitutions is not None:
+            plan = {key: [apply_substitutions(item, substitutions) for item in items] for key, items in entry["plan"].items()}
+            mode = "reuse"
+        else:
+            plan, mode, substitutions = entry["plan"], "adapt", {}
+        return PlanMatch(plan=plan, mode=mode, similarity=similarity, source_query=entry["query"],
+                         planning_seconds=entry["planning_seconds"], substitutions=substitutions)
+
+    def add(self, query: str, context: str, schema: str, plan: dict, planning_seconds: float) -> None:
+        if not self.enabled:
+            return
+        entry = {"query": query, "context": context, "schema": schema, "plan": plan,
+                 "planning_seconds": planning_seconds, "created": time.time()}
+        with self._lock:
+            self._append(entry)
+            if self.path is None:
+                return
+            entries = list(self._entries)
+            path = self.path
+        # write to a temporary file first so concurrent readers never see a partial library
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp_path.write_text(json.dumps(entries), encoding="utf-8")
+            os.replace(tmp_path, path)
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
+
+    def record(self, mode: str, seconds_saved: float) -> None:
+        """Count a reused ("reuse") or adapted ("adapt") plan and the planning time it saved"""
+        with self._lock:
+            if mode == "reuse":
+                self.reused += 1
+            else:
+                self.adapted += 1
+            self.seconds_saved += seconds_saved
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "plans": len(self._entries),
+                "lookups": self.lookups,
+                "reused": self.reused,
+                "adapted": self.adapted,
+                "reuse_rate": self.reused / self.lookups if self.lookups else 0.0,
+                "adapt_rate": self.adapted / self.lookups if self.lookups else 0.0,
+                "seconds_saved": self.seconds_saved,
+            }
+
+
+plan_library = PlanLibrary(
+    os.getenv("PLAN_LIBRARY_PATH") or None,
+    reuse_threshold=float(os.getenv("PLAN_REUSE_THRESHOLD", "0.8")),
+    adapt_threshold=float(os.getenv("PLAN_ADAPT_THRESHOLD", "0.6")),
+    enabled=os.getenv("PLAN_REUSE", "1").lower() not in ("0", "false", "no"),
+    skip_planner=os.getenv("PLAN_SKIP_PLANNER", "").lower() in ("1", "true", "yes"),
+)
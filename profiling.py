@@ -0,0 +1,294 @@
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from html import escape
+
+from metrics import percentile
+
+
+# Opt-in profiler for agent runs (stdlib only, works offline)
+# - a sampler thread records the stacks of the event loop thread and of the threads running
+#   this run's tools (see track_run_thread) -> folded stacks + SVG flame graph
+# - a heartbeat task on the event loop measures loop lag
+# - when the heartbeat stalls for longer than the threshold, the loop thread's stack is
+#   captured and the blocking call is attributed to the agent tool found in it
+
+PROFILE_ENV = "SLIDES_PROFILE"
+BLOCK_MS_ENV = "SLIDES_PROFILE_BLOCK_MS"
+
+
+def profiling_enabled(profile: bool | None = None) -> bool:
+    """Explicit argument wins, otherwise SLIDES_PROFILE=1 enables profiling"""
+    if profile is not None:
+        return profile
+    return os.getenv(PROFILE_ENV, "").lower() in ("1", "true", "yes")
+
+
+# profiler of the current run, inherited by its tasks and by the threads its tools run in
+_active_profiler: contextvars.ContextVar["Profiler | None"] = contextvars.ContextVar("active_profiler", default=None)
+
+
+def track_run_thread(func):
+    """Decorator for functions run in worker threads, their threads are sampled while the run is profiled"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = _active_profiler.get()
+        if profiler is None:
+            return func(*args, **kwargs)
+        ident = threading.get_ident()
+        with profiler._threads_lock:
+            profiler._threads[ident] = profiler._threads.get(ident, 0) + 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with profiler._threads_lock:
+                profiler._threads[ident] -= 1
+                if not profiler._threads[ident]:
+                    del profiler._threads[ident]
+    return wrapper
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)})".replace(";", ":")
+
+
+def _stack(frame) -> list:
+    """Frames of a stack from the outermost to the innermost"""
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+class Profiler:
+    """
+    Samples stacks and watches the event loop of one run.
+    """
+    def __init__(self, tool_names: list[str] | tuple[str, ...] = (), sample_interval: float = 0.005,
+                 heartbeat_interval: float = 0.01, block_threshold_ms: float | None = None):
+        self.tool_names = set(tool_names)
+        self.sample_interval = sample_interval
+        self.heartbeat_interval = heartbeat_interval
+        if block_threshold_ms is None:
+            block_threshold_ms = float(os.getenv(BLOCK_MS_ENV, "100"))
+        self.block_threshold = block_threshold_ms / 1000
+
+        self.folded: Counter[str] = Counter()
+        self.tool_samples: Counter[str] = Counter()
+        self.lag_samples: list[float] = []
+        self.blocking_events: list[dict] = []
+        self.samples = 0
+
+        self._loop_thread_id: int | None = None
+        self._last_beat = 0.0
+        self._current_block: dict | None = None
+        self._started = 0.0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._heartbeat_task: asyncio.Task | None = None
+        self._context_token: contextvars.Token | None = None
+        # ident -> number of tracked calls running in that thread
+        self._threads: dict[int, int] = {}
+        self._threads_lock = threading.Lock()
+
+    # lifecycle
+
+    def start(self) -> None:
+        """Start profiling, must be called from the event loop thread in the context of the run"""
+        self._loop_thread_id = threading.get_ident()
+        self._context_token = _active_profiler.set(self)
+        self._started = self._last_beat = time.perf_counter()
+        self._heartbeat_task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._sample_loop, name="profiler-sampler", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> dict:
+        self._stop.set()
+        if self._context_token is not None:
+            _active_profiler.reset(self._context_token)
+            self._context_token = None
+        if self._thread is not None:
+            self._thread.join()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+        self._finish_block()
+        return self.report()
+
+    # event loop side
+
+    async def _heartbeat(self):
+        while True:
+            start = time.perf_counter()
+            self._last_beat = start
+            await asyncio.sleep(self.heartbeat_interval)
+            self.lag_samples.append(max(0.0, time.perf_counter() - start - self.heartbeat_interval))
+
+    # sampler thread
+
+    def _sample_loop(self):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        while not self._stop.wait(self.sample_interval):
+            frames = sys._current_frames()
+            with self._threads_lock:
+                run_threads = {self._loop_thread_id, *self._threads}
+            if any(ident not in names for ident in run_threads if ident in frames):
+                names = {t.ident: t.name for t in threading.enumerate()}
+            self.samples += 1
+
+            for ident in run_threads:
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = _stack(frame)
+                labels = [names.get(ident, f"thread-{ident}")] + [_frame_label(f) for f in stack]
+                self.folded[";".join(labels)] += 1
+                tool = self._find_tool(stack)
+                if tool is not None:
+                    self.tool_samples[tool] += 1
+
+            self._check_loop(frames, run_threads)
+
+    def _find_tool(self, stack: list) -> str | None:
+        for frame in reversed(stack):
+            if frame.f_code.co_name in self.tool_names:
+                return frame.f_code.co_name
+        return None
+
+    def _check_loop(self, frames: dict, run_threads: set[int]) -> None:
+        stalled = time.perf_counter() - self._last_beat - self.heartbeat_interval
+        if stalled < self.block_threshold:
+            self._finish_block()
+            return
+        if self._current_block is None:
+            loop_frame = frames.get(self._loop_thread_id)
+            stack = _stack(loop_frame) if loop_frame is not None else []
+            self._current_block = {
+                "start_s": round(self._last_beat + self.heartbeat_interval - self._started, 3),
+                "duration_ms": 0.0,
+                "tool": self._find_tool(stack),
+                # sync tools run in worker threads, they stall the loop through the GIL
+                "running_tools": [],
+                "stack": [_frame_label(f) for f in stack[-15:]],
+            }
+        self._current_block["duration_ms"] = round(stalled * 1000, 1)
+        running = self._current_block["running_tools"]
+        for ident in run_threads - {self._loop_thread_id}:
+            frame = frames.get(ident)
+            tool = self._find_tool(_stack(frame)) if frame is not None else None
+            if tool is not None and tool not in running:
+                running.append(tool)
+
+    def _finish_block(self) -> None:
+        if self._current_block is not None:
+            self.blocking_events.append(self._current_block)
+            block = self._current_block
+            running = f", tools running: {', '.join(block['running_tools'])}" if block["running_tools"] else ""
+            print(f"Event loop blocked for {block['duration_ms']:.0f} ms"
+                  f" in {block['tool'] or block['stack'][-1:]}{running}")
+            self._current_block = None
+
+    # output
+
+    def report(self) -> dict:
+        blocked_by_tool: Counter[str] = Counter()
+        for event in self.blocking_events:
+            # the tool on the loop thread, else the tools running in the run's threads meanwhile
+            for tool in ([event["tool"]] if event["tool"] else event["running_tools"]) or ["<no tool>"]:
+                blocked_by_tool[tool] += event["duration_ms"]
+
+        self_time: Counter[str] = Counter()
+        for stack, count in self.folded.items():
+            self_time[stack.rsplit(";", 1)[-1]] += count
+
+        return {
+            "duration_s": round(time.perf_counter() - self._started, 3),
+            # the loop thread is shared with other runs on the same event loop (e.g. batch jobs)
+            "scope": "event loop thread and this run's tool threads",
+            "samples": self.samples,
+            "sample_interval_ms": self.sample_interval * 1000,
+            "loop_lag_ms": {
+                "p50": percentile(self.lag_samples, 50) * 1000,
+                "p99": percentile(self.lag_samples, 99) * 1000,
+                "max": max(self.lag_samples, default=0.0) * 1000,
+            },
+            "block_threshold_ms": self.block_threshold * 1000,
+            "blocking_events": self.blocking_events,
+            "blocked_ms_by_tool": dict(blocked_by_tool),
+            # sampled wall time spent inside each tool, over this run's threads
+            "tool_time_s": {tool: round(n * self.sample_interval, 3) for tool, n in self.tool_samples.most_common()},
+            "top_frames": [{"frame": frame, "samples": n} for frame, n in self_time.most_common(20)],
+        }
+
+    def write(self, directory: str | os.PathLike, report: dict | None = None) -> str:
+        """Write profile_report.json, profile.folded and flamegraph.svg, return the report path"""
+        os.makedirs(directory, exist_ok=True)
+        report = report if report is not None else self.report()
+        report_path = os.path.join(directory, "profile_report.json")
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        with open(os.path.join(directory, "profile.folded"), "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.folded.items()):
+                f.write(f"{stack} {count}\n")
+        with open(os.path.join(directory, "flamegraph.svg"), "w", encoding="utf-8") as f:
+            f.write(render_flamegraph(self.folded))
+        return report_path
+
+
+def render_flamegraph(folded: Counter, width: int = 1200, row_height: int = 16) -> str:
+    """Minimal self-contained SVG flame graph of folded stacks (hover a frame for its sample count)"""
+    tree: dict = {"count": 0, "children": {}}
+    for stack, count in folded.items():
+        node = tree
+        node["count"] += count
+        for label in stack.split(";"):
+            node = node["children"].setdefault(label, {"count": 0, "children": {}})
+            node["count"] += count
+
+    total = tree["count"] or 1
+    rects = []
+    max_depth = 0
+
+    def walk(node: dict, x: float, depth: int):
+        nonlocal max_depth
+        for label, child in sorted(node["children"].items()):
+            w = child["count"] / total * width
+            if w >= 0.5:
+                max_depth = max(max_depth, depth)
+                rects.append((x, depth, w, label, child["count"]))
+                walk(child, x, depth + 1)
+            x += w
+
+    walk(tree, 0.0, 0)
+    height = (max_depth + 1) * row_height
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" font-family="monospace" font-size="11">'
+    ]
+    for x, depth, w, label, count in rects:
+        y = height - (depth + 1) * row_height
+        hue = zlib.crc32(label.encode()) % 60
+        text = escape(label)
+        parts.append(
+            f'<g><title>{text} ({count} samples, {count / total:.1%})</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{row_height - 1}" fill="hsl({hue},80%,60%)"/>'
+        )
+        if w > 30:
+            parts.append(
+                f'<text x="{x + 2:.1f}" y="{y + row_height - 4}">{escape(label[:int(w / 7)])}</text>'
+            )
+        parts.append('</g>')
+    parts.append('</svg>')
+    return "\n".join(parts)
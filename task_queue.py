@@ -0,0 +1,296 @@
+import base64
+import os
+import sqlite3
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Callable
+
+from pydantic import BaseModel, Field
+
+from artifacts import Workspace
+
+
+# Distributed slide generation
+# The coordinator turns every planned section into a serializable SlideTask and puts it on a
+# queue; stateless workers (worker.py, any number of processes or hosts) claim tasks, run the
+# slide agent and post a SlideTaskResult. Backends are pluggable through QUEUE_BACKENDS, the
+# SQLite one is enough for tests and for several processes on one host (local disk only).
+
+class SlideTask(BaseModel):
+    task_id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    run_id: str = Field(description="The run the slide belongs to")
+    index: int = Field(description="Position of the slide in the presentation")
+    section: str
+    instruction: str
+    user_query: str
+    context: str = ""
+    csv_path: str = ""
+    current_date: str = ""
+
+
+class SlideTaskResult(BaseModel):
+    task_id: str
+    run_id: str
+    index: int
+    slide: dict = Field(default_factory=dict, description="SlideFormat as a dict")
+    summary: str = ""
+    references: list[str] = Field(default_factory=list)
+    # images/graphs of the slide (slide attribute -> {"name", "data" (base64)}), so the
+    # coordinator doesn't need access to the worker's file system
+    artifacts: dict[str, dict[str, str]] = Field(default_factory=dict)
+    worker_id: str = ""
+    error: str = ""
+
+
+class TaskQueue(ABC):
+    """
+    Interface of the slide task queue backends.
+    """
+    @abstractmethod
+    def put_tasks(self, tasks: list[SlideTask]) -> None:
+        ...
+
+    @abstractmethod
+    def claim(self, worker_id: str) -> SlideTask | None:
+        """Lease the next pending task, or None if there is none"""
+
+    @abstractmethod
+    def heartbeat(self, task_id: str, worker_id: str) -> bool:
+        """Extend the lease of a claimed task, False if the worker lost it"""
+
+    @abstractmethod
+    def complete(self, result: SlideTaskResult) -> bool:
+        """Store the result of a task the worker still holds, False if the result was dropped"""
+
+    @abstractmethod
+    def release(self, task_id: str, worker_id: str, error: str) -> None:
+        """Give a claimed task back after a failure, it fails for good after max_attempts"""
+
+    @abstractmethod
+    def results(self, run_id: str, exclude: set[str] | frozenset[str] = frozenset()) -> list[SlideTaskResult]:
+        """Results of a run, without those whose task_id is in exclude (already fetched)"""
+
+    @abstractmethod
+    def delete_run(self, run_id: str) -> None:
+        ...
+
+
+class SQLiteTaskQueue(TaskQueue):
+    """
+    Task queue in a SQLite file, safe to share between processes on one host.
+
+    WAL mode needs shared memory, so the file must not be on a network file system.
+    """
+    def __init__(self, path: str | os.PathLike, lease_seconds: float = 600.0, max_attempts: int = 3):
+        self.path = os.fspath(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    task_id TEXT PRIMARY KEY,
+                    run_id TEXT NOT NULL,
+                    idx INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    worker_id TEXT,
+                    lease_until REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, created)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    task_id TEXT PRIMARY KEY,
+                    run_id TEXT NOT NULL,
+                    payload TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS results_run ON results (run_id)")
+
+    @classmethod
+    def from_url(cls, url: str) -> "SQLiteTaskQueue":
+        """sqlite:///relative/path.db or sqlite:////absolute/path.db"""
+        prefix = "sqlite:///"
+        return cls(url[len(prefix):] if url.startswith(prefix) else url.split("://", 1)[1])
+
+    def _connect(self) -> "_ClosingConnection":
+        # one short-lived connection per call keeps the queue usable from threads and processes
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout=30000")
+        return _ClosingConnection(conn)
+
+    def put_tasks(self, tasks: list[SlideTask]) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO tasks (task_id, run_id, idx, payload, created) VALUES (?, ?, ?, ?, ?)",
+                [(t.task_id, t.run_id, t.index, t.model_dump_json(), now) for t in tasks],
+            )
+            conn.execute("COMMIT")
+
+    def claim(self, worker_id: str) -> SlideTask | None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # tasks whose workers died max_attempts times are failed instead of handed out again
+            expired = conn.execute(
+                "SELECT task_id, run_id, idx, worker_id FROM tasks WHERE status = 'claimed' AND lease_until < ? AND attempts >= ?",
+                (now, self.max_attempts),
+            ).fetchall()
+            for task_id, run_id, index, previous_worker in expired:
+                self._fail(conn, task_id, run_id, index, previous_worker, "Lease expired too many times")
+            row = conn.execute(
+                """
+                SELECT task_id, payload FROM tasks
+                WHERE status = 'pending' OR (status = 'claimed' AND lease_until < ?)
+                ORDER BY created, idx LIMIT 1
+                """,
+                (now,),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE tasks SET status = 'claimed', worker_id = ?, lease_until = ?, attempts = attempts + 1 WHERE task_id = ?",
+                (worker_id, now + self.lease_seconds, row[0]),
+            )
+            conn.execute("COMMIT")
+        return SlideTask.model_validate_json(row[1])
+
+    def heartbeat(self, task_id: str, worker_id: str) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET lease_until = ? WHERE task_id = ? AND worker_id = ? AND status = 'claimed'",
+                (time.time() + self.lease_seconds, task_id, worker_id),
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, result: SlideTaskResult) -> bool:
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # a worker whose lease expired must not overwrite the result of the one that re-claimed the task
+            cursor = conn.execute(
+                "UPDATE tasks SET status = 'done', lease_until = NULL WHERE task_id = ? AND worker_id = ? AND status = 'claimed'",
+                (result.task_id, result.worker_id),
+            )
+            if cursor.rowcount != 1:
+                conn.execute("COMMIT")
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO results (task_id, run_id, payload) VALUES (?, ?, ?)",
+                (result.task_id, result.run_id, result.model_dump_json()),
+            )
+            conn.execute("COMMIT")
+        return True
+
+    def release(self, task_id: str, worker_id: str, error: str) -> None:
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT run_id, idx, attempts FROM tasks WHERE task_id = ? AND worker_id = ?", (task_id, worker_id)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return
+            run_id, index, attempts = row
+            if attempts < self.max_attempts:
+                conn.execute(
+                    "UPDATE tasks SET status = 'pending', worker_id = NULL, lease_until = NULL WHERE task_id = ?",
+                    (task_id,),
+                )
+            else:
+                self._fail(conn, task_id, run_id, index, worker_id, error)
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _fail(conn: sqlite3.Connection, task_id: str, run_id: str, index: int, worker_id: str, error: str) -> None:
+        result = SlideTaskResult(task_id=task_id, run_id=run_id, index=index, worker_id=worker_id or "", error=error)
+        conn.execute("UPDATE tasks SET status = 'failed', lease_until = NULL WHERE task_id = ?", (task_id,))
+        conn.execute(
+            "INSERT OR REPLACE INTO results (task_id, run_id, payload) VALUES (?, ?, ?)",
+            (task_id, run_id, result.model_dump_json()),
+        )
+
+    def results(self, run_id: str, exclude: set[str] | frozenset[str] = frozenset()) -> list[SlideTaskResult]:
+        with self._connect() as conn:
+            # ids first, so payloads with embedded images are only read and parsed once
+            task_ids = [row[0] for row in conn.execute("SELECT task_id FROM results WHERE run_id = ?", (run_id,))]
+            new_ids = [task_id for task_id in task_ids if task_id not in exclude]
+            if not new_ids:
+                return []
+            placeholders = ",".join("?" * len(new_ids))
+            rows = conn.execute(f"SELECT payload FROM results WHERE task_id IN ({placeholders})", new_ids).fetchall()
+        return [SlideTaskResult.model_validate_json(row[0]) for row in rows]
+
+    def delete_run(self, run_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM tasks WHERE run_id = ?", (run_id,))
+            conn.execute("DELETE FROM results WHERE run_id = ?", (run_id,))
+            conn.execute("COMMIT")
+
+
+class _ClosingConnection:
+    """sqlite3 connections don't close on exiting a with block, this wrapper does"""
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self._conn.in_transaction:
+            self._conn.execute("ROLLBACK")
+        self._conn.close()
+
+
+ARTIFACT_ATTRIBUTES = {"image_path": "image", "graph_path": "graph"}
+
+
+def encode_slide_artifacts(slide, workspace: Workspace | None = None) -> dict[str, dict[str, str]]:
+    """Embed the image/graph files of a slide so the result can travel to another host"""
+    artifacts = {}
+    for attr in ARTIFACT_ATTRIBUTES:
+        path = getattr(slide, attr)
+        if not path:
+            continue
+        if not os.path.isfile(path) and workspace is not None:
+            path = workspace.find(os.path.basename(path)) or path
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                artifacts[attr] = {"name": os.path.basename(path), "data": base64.b64encode(f.read()).decode("ascii")}
+    return artifacts
+
+
+def materialize_slide_artifacts(slide, artifacts: dict[str, dict[str, str]], workspace: Workspace | None = None) -> None:
+    """Write the embedded files of a result into the local workspace and point the slide at them"""
+    for attr, artifact in artifacts.items():
+        if attr not in ARTIFACT_ATTRIBUTES:
+            continue
+        if workspace is not None:
+            path = workspace.path_for(artifact["name"], ARTIFACT_ATTRIBUTES[attr])
+        else:
+            path = artifact["name"]
+        with open(path, "wb") as f:
+            f.write(base64.b64decode(artifact["data"]))
+        setattr(slide, attr, str(path))
+
+
+# url scheme -> factory, other backends (redis, SQS, ...) register here
+QUEUE_BACKENDS: dict[str, Callable[[str], TaskQueue]] = {
+    "sqlite": SQLiteTaskQueue.from_url,
+}
+
+
+def open_queue(url: str) -> TaskQueue:
+    """Open a queue from a url such as sqlite:///slides.db"""
+    scheme = url.split("://", 1)[0]
+    if scheme not in QUEUE_BACKENDS:
+        raise ValueError(f"Unknown task queue backend {scheme!r}, available: {', '.join(QUEUE_BACKENDS)}")
+    return QUEUE_BACKENDS[scheme](url)
+
@@ -0,0 +1,58 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from plan_library import PlanLibrary, query_substitutions  # noqa: E402
+
+
+ROMAN_PLAN = {
+    "sections": ["Introduction", "Founding of Rome", "Julius Caesar and Augustus", "Fall of the Roman Empire"],
+    "instructions": ["Introduce the Roman Empire", "Research the founding of Rome", "Cover Julius Caesar", "Explain the fall"],
+}
+SALES_PLAN = {
+    "sections": ["Q3 2024 overview", "Q3 2024 revenue by region"],
+    "instructions": ["Summarize Q3 2024 sales", "Graph the Q3 2024 revenue per region"],
+}
+
+
+def _library(skip_planner=True):
+    library = PlanLibrary(skip_planner=skip_planner)
+    library.add("Generate a presentation on the history of the Roman Empire", "", "", ROMAN_PLAN, 10.0)
+    library.add("Generate a presentation on Python programming", "", "", ROMAN_PLAN, 10.0)
+    library.add("Q3 2024 sales review for region APAC", "", "region,revenue", SALES_PLAN, 10.0)
+    return library
+
+
+def test_changed_topic_names_are_never_reused():
+    library = _library()
+    for query in ("Generate a presentation on the history of the Ottoman Empire",
+                  "Generate a presentation on the history of the British Empire",
+                  "Generate a presentation on Rust programming"):
+        match = library.lookup(query)
+        assert match is None or match.mode == "adapt", query
+
+
+def test_changed_region_goes_to_the_planner():
+    match = _library().lookup("Q3 2024 sales review for region EMEA", "", "region,revenue")
+    assert match is not None and match.mode == "adapt"
+    assert match.plan == SALES_PLAN
+
+
+def test_changed_numbers_are_substituted_when_skipping_the_planner():
+    match = _library().lookup("Q4 2024 sales review for region APAC", "", "region,revenue")
+    assert match is not None and match.mode == "reuse"
+    assert match.substitutions == {"Q3": "Q4"}
+    assert match.plan["sections"] == ["Q4 2024 overview", "Q4 2024 revenue by region"]
+
+
+def test_planner_is_not_skipped_by_default():
+    match = _library(skip_planner=False).lookup("Q4 2024 sales review for region APAC", "", "region,revenue")
+    assert match is not None and match.mode == "adapt"
+
+
+def test_function_words_and_topic_words_are_not_substituted():
+    assert query_substitutions("Generate a presentation on climate", "Make a deck on climate", 0.34) is None
+    assert query_substitutions("sales for APAC", "sales about APAC", 0.34) is None
+    assert query_substitutions("Roman Empire history", "Ottoman Empire history", 0.34) is None
+    assert query_substitutions("FY23 results", "FY24 results", 0.5) == {"FY23": "FY24"}
@@ -0,0 +1,102 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+
+
+# Text normalization for scraped pages
+# One precompiled pattern removes leftover tags and every character that is not an ASCII
+# letter, digit or whitespace in a single pass over the document; paragraphs are then
+# filtered and truncated while splitting, stopping as soon as enough words are collected.
+
+# tags first so their content is dropped as a whole, '<' is only removed on its own if it opens no tag
+_CLEAN_PATTERN = re.compile(r'<[^>]+>|[^a-zA-Z0-9\s<]+|<')
+
+MIN_PARAGRAPH_WORDS = 10
+
+_SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "head"}
+_BLOCK_TAGS = {
+    "p", "div", "br", "li", "ul", "ol", "tr", "td", "th", "table", "section", "article", "header", "footer",
+    "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "hr", "main", "nav", "aside", "title",
+}
+
+
+def normalize_text(content: str, max_words: int, min_paragraph_words: int = MIN_PARAGRAPH_WORDS) -> str:
+    """
+    Clean a page and return its first max_words words.
+
+    Keeps only ASCII letters, digits and whitespace, drops paragraphs (lines) with
+    min_paragraph_words words or fewer and joins the rest with single spaces.
+    """
+    if max_words <= 0:
+        return ""
+    words: list[str] = []
+    for paragraph in _CLEAN_PATTERN.sub('', content).split('\n'):
+        paragraph_words = paragraph.split()
+        if len(paragraph_words) > min_paragraph_words:
+            words.extend(paragraph_words)
+            if len(words) >= max_words:
+                break
+    return ' '.join(words[:max_words])
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: list[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in _BLOCK_TAGS:
+            self.parts.append('\n')
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in _BLOCK_TAGS:
+            self.parts.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in _BLOCK_TAGS:
+            self.parts.append('\n')
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    """Visible text of an HTML document, one line per block element, without scripts and styles"""
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return ''.join(extractor.parts)
+
+
+def normalize_html(html: str, max_words: int, min_paragraph_words: int = MIN_PARAGRAPH_WORDS) -> str:
+    """normalize_text for raw HTML documents"""
+    return normalize_text(html_to_text(html), max_words, min_paragraph_words)
+
+
+def _normalize_item(item: tuple[str, int, bool]) -> str:
+    content, max_words, is_html = item
+    return normalize_html(content, max_words) if is_html else normalize_text(content, max_words)
+
+
+def normalize_batch(documents: list[str], max_words: int, is_html: bool = False,
+                    processes: int | None = None, min_batch: int = 8) -> list[str]:
+    """
+    Normalize many documents, in a process pool when there are enough of them.
+
+    processes defaults to the CPU count; batches smaller than min_batch (or processes=1)
+    run inline since starting the pool would cost more than it saves.
+    """
+    items = [(document, max_words, is_html) for document in documents]
+    processes = processes or os.cpu_count() or 1
+    if processes <= 1 or len(items) < min_batch:
+        return [_normalize_item(item) for item in items]
+    with ProcessPoolExecutor(max_workers=min(processes, len(items))) as pool:
+        chunksize = max(1, len(items) // (processes * 4))
+        return list(pool.map(_normalize_item, items, chunksize=chunksize))
@@ -0,0 +1,35 @@
+import hashlib
+import os
+
+import pandas as pd
+
+from artifacts import Workspace
+
+
+# Upload pipeline for the Streamlit app
+# Uploads are copied to a unique workspace path in fixed size chunks while hashing them,
+# the preview only parses the first rows of the file.
+
+CHUNK_SIZE = 1024 * 1024
+PREVIEW_ROWS = 5
+
+
+def save_upload(file_obj, workspace: Workspace, name: str) -> tuple[str, str]:
+    """Stream an uploaded file into the workspace, return its path and sha256 digest"""
+    digest = hashlib.sha256()
+    path = workspace.path_for(name, "upload")
+    if hasattr(file_obj, "seek"):
+        file_obj.seek(0)
+    with open(path, "wb") as f:
+        while True:
+            chunk = file_obj.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            f.write(chunk)
+    return str(path), digest.hexdigest()
+
+
+def read_preview(path: str | os.PathLike, rows: int = PREVIEW_ROWS) -> pd.DataFrame:
+    """Parse only the first rows of a CSV file"""
+    return pd.read_csv(path, nrows=rows)
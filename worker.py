@@ -0,0 +1,119 @@
+"""
+Slide worker for distributed presentation generation.
+
+Claims slide tasks from the queue shared with the coordinator (a run started with
+task_queue=... or SLIDES_TASK_QUEUE), runs the slide agent and posts the slide back,
+with its images and graphs embedded. Start as many workers as needed, on any host
+that can reach the queue (and the uploaded CSV files, if any); with the SQLite
+backend that is the coordinator's host.
+
+Usage:
+    python worker.py --queue sqlite:///slides.db --concurrency 2
+"""
+import argparse
+import asyncio
+import os
+import socket
+import time
+import uuid
+
+from artifacts import ArtifactStore, current_workspace, default_store
+from task_queue import SlideTask, SlideTaskResult, TaskQueue, encode_slide_artifacts, open_queue
+
+
+async def _keep_lease(queue: TaskQueue, task: SlideTask, worker_id: str, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        if not await asyncio.to_thread(queue.heartbeat, task.task_id, worker_id):
+            print(f"Lost the lease of slide {task.index + 1} of {task.run_id}")
+            return
+
+
+async def process_task(queue: TaskQueue, task: SlideTask, worker_id: str, store: ArtifactStore,
+                       heartbeat_interval: float = 60.0) -> bool:
+    """Generate the slide of one task in its own workspace, True if it succeeded"""
+    from agent import State, generate_slide
+
+    workspace = store.create_workspace(f"{task.run_id}_{task.index}")
+    state = State(user_query=task.user_query, context=task.context, csv_path=task.csv_path,
+                  current_date=task.current_date, run_id=task.run_id, workspace_dir=str(workspace.path))
+    token = current_workspace.set(workspace)
+    heartbeat = asyncio.create_task(_keep_lease(queue, task, worker_id, heartbeat_interval))
+    try:
+        output = await generate_slide(state, task.section, task.instruction)
+        result = SlideTaskResult(
+            task_id=task.task_id,
+            run_id=task.run_id,
+            index=task.index,
+            slide=output.slide.model_dump(),
+            summary=output.summary,
+            references=output.references,
+            artifacts=encode_slide_artifacts(output.slide, workspace),
+            worker_id=worker_id,
+        )
+        if not await asyncio.to_thread(queue.complete, result):
+            print(f"Slide {task.index + 1} of {task.run_id} dropped, the task was handed to another worker")
+            return False
+        print(f"Slide {task.index + 1} of {task.run_id} done: {output.slide.title}")
+        return True
+    except Exception as e:
+        print(f"Slide {task.index + 1} of {task.run_id} failed: {e!r}")
+        await asyncio.to_thread(queue.release, task.task_id, worker_id, repr(e))
+        return False
+    finally:
+        heartbeat.cancel()
+        current_workspace.reset(token)
+        workspace.close()
+
+
+async def run_worker(queue_url: str, concurrency: int = 1, poll_interval: float = 1.0,
+                     idle_exit: float | None = None) -> int:
+    """
+    Process tasks until interrupted, or until no task arrived for idle_exit seconds.
+
+    Returns the number of slides generated.
+    """
+    queue = open_queue(queue_url)
+    store = default_store()
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    # renew well before the lease runs out
+    heartbeat_interval = max(1.0, getattr(queue, "lease_seconds", 180.0) / 3)
+    done = 0
+
+    async def slot(number: int):
+        nonlocal done
+        slot_id = f"{worker_id}-{number}"
+        idle_since = time.monotonic()
+        while True:
+            task = await asyncio.to_thread(queue.claim, slot_id)
+            if task is None:
+                if idle_exit is not None and time.monotonic() - idle_since > idle_exit:
+                    return
+                await asyncio.sleep(poll_interval)
+                continue
+            if await process_task(queue, task, slot_id, store, heartbeat_interval):
+                done += 1
+            idle_since = time.monotonic()
+
+    print(f"Worker {worker_id} consuming {queue_url} with {concurrency} slot(s)")
+    await asyncio.gather(*(slot(number) for number in range(concurrency)))
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate slides from a distributed task queue")
+    parser.add_argument("--queue", default=os.getenv("SLIDES_TASK_QUEUE"),
+                        help="Queue url, e.g. sqlite:///slides.db (default: SLIDES_TASK_QUEUE)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Slides generated at once by this worker")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between polls of an empty queue")
+    parser.add_argument("--idle-exit", type=float, default=None, help="Exit after this many idle seconds")
+    args = parser.parse_args()
+    if not args.queue:
+        parser.error("--queue or SLIDES_TASK_QUEUE is required")
+
+    done = asyncio.run(run_worker(args.queue, args.concurrency, args.poll_interval, args.idle_exit))
+    print(f"Generated {done} slides")
+
+
+if __name__ == "__main__":
+    main()